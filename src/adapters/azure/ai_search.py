@@ -1,12 +1,19 @@
+import base64
+import hashlib
+import json
 import logging
+import time
 from typing import Any, Dict, List
 
 from azure.core.credentials import AzureKeyCredential
-from azure.search.documents.aio import SearchClient
+from azure.core.exceptions import ResourceNotFoundError
+from azure.search.documents.aio import SearchClient, SearchIndexingBufferedSender
 from azure.search.documents.indexes.aio import SearchIndexClient
 from azure.search.documents.indexes.models import (
     HnswAlgorithmConfiguration,
     HnswParameters,
+    ScalarQuantizationCompression,
+    ScalarQuantizationParameters,
     SearchableField,
     SearchField,
     SearchFieldDataType,
@@ -16,13 +23,26 @@ from azure.search.documents.indexes.models import (
     VectorSearchProfile,
 )
 from azure.search.documents.models import VectorizedQuery
-from langchain_openai import AzureOpenAIEmbeddings
+import numpy as np
+import orjson
+from openai import AsyncAzureOpenAI
 
 from src.domain.ports.search_port import SearchPort
 from src.infrastructure.azure_setup import settings
+from src.infrastructure.micro_batcher import MicroBatcher
+from src.infrastructure.semantic_cache import SemanticCache
+from src.infrastructure.vector_memo import QueryVectorMemo
 
 logger = logging.getLogger(__name__)
 
+MAX_BATCH_ACTION_COUNT = 32000
+MAX_BATCH_BYTES = 14_000_000
+VECTOR_COMPRESSION_NAME = "sq-int8"
+
+CONTEXT_BLOCK_TEMPLATE = (
+    "FUENTE: {title}\nMETADATOS: Archivo {source}, Página {page}\nCONTENIDO: {content}"
+)
+
 
 class AzureAISearchService(SearchPort):
     def __init__(self):
@@ -33,82 +53,122 @@ class AzureAISearchService(SearchPort):
         self.index_client = SearchIndexClient(
             endpoint=self.endpoint, credential=self.credential
         )
-
-    async def search_technical_docs(self, query: str) -> Dict[str, Any]:
-        logger.info(f"search_technical_docs - Iniciando búsqueda para query: '{query[:100]}...'")
-
-        embeddings_model = AzureOpenAIEmbeddings(
-            azure_deployment=settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+        # Clientes de larga vida: reutilizan el pool de conexiones entre consultas
+        self.search_client = SearchClient(self.endpoint, self.index_name, self.credential)
+        # SDK nativo en la ruta caliente: sin la capa Runnable/callbacks de LangChain
+        self.openai_client = AsyncAzureOpenAI(
             azure_endpoint=str(settings.AZURE_OPENAI_ENDPOINT),
             api_key=settings.AZURE_OPENAI_API_KEY,
+            api_version=settings.AZURE_OPENAI_API_VERSION,
+        )
+        self.query_cache = SemanticCache(
+            threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+            ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+            max_size=settings.SEMANTIC_CACHE_MAX_SIZE,
+        )
+        self.query_vectors = QueryVectorMemo()
+        self.embed_batcher = MicroBatcher(
+            self._embed_batch,
+            max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_seconds=settings.EMBEDDING_BATCH_WINDOW_MS / 1000,
         )
 
+    async def aclose(self) -> None:
+        await self.embed_batcher.aclose()
+        await self.search_client.close()
+        await self.index_client.close()
+        await self.openai_client.close()
+
+    async def _embed_batch(self, queries: List[str]) -> List[List[float]]:
+        # base64 viaja ~25% más compacto que la lista JSON de floats
+        response = await self.openai_client.embeddings.create(
+            input=queries,
+            model=settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+            encoding_format="base64",
+        )
+        return [
+            np.frombuffer(base64.b64decode(item.embedding), dtype=np.float32).tolist()
+            for item in sorted(response.data, key=lambda item: item.index)
+        ]
+
+    async def embed_query(self, query: str) -> List[float]:
+        # Memo compartido: la caché de respuestas y la búsqueda del turno reutilizan el vector
+        return await self.query_vectors.get_or_compute(query, self.embed_batcher.submit)
+
+    async def search_technical_docs(self, query: str) -> Dict[str, Any]:
+        logger.debug("search_technical_docs - Iniciando búsqueda para query: '%.100s...'", query)
+
         try:
             if not self.endpoint or not self.index_name or not self.credential:
                 raise ValueError(
                     "Configuración de Azure Search incompleta. Verifica las variables de entorno."
                 )
 
-            logger.info("search_technical_docs - Generando embeddings...")
-            query_vector = await embeddings_model.aembed_query(query)
-            logger.info(
-                f"search_technical_docs - Embeddings generados, dimensión: {len(query_vector)}"
+            logger.debug("search_technical_docs - Generando embeddings...")
+            query_vector = await self.embed_query(query)
+            logger.debug(
+                "search_technical_docs - Embeddings generados, dimensión: %d", len(query_vector)
             )
 
-            async with SearchClient(
-                self.endpoint, self.index_name, self.credential
-            ) as client:
-                vector_query = VectorizedQuery(
-                    vector=query_vector, k_nearest_neighbors=5, fields="content_vector"
-                )
+            cached_result = self.query_cache.lookup(query_vector)
+            if cached_result is not None:
+                logger.info("search_technical_docs - Resultado servido desde caché semántica")
+                return cached_result
 
-                logger.info("search_technical_docs - Ejecutando búsqueda híbrida...")
-                results = await client.search(
-                    search_text=query,
-                    vector_queries=[vector_query],
-                    top=5,
-                    select=["title", "content", "source", "page_number"],
-                )
-
-                context_blocks = []
-                raw_docs = []
+            vector_query = VectorizedQuery(
+                vector=query_vector, k_nearest_neighbors=5, fields="content_vector"
+            )
 
-                result_count = 0
-                async for result in results:
-                    result_count += 1
-                    page = result.get("page_number")
-                    page_label = str(page) if page is not None else "N/A"
+            logger.debug("search_technical_docs - Ejecutando búsqueda híbrida...")
+            results = await self.search_client.search(
+                search_text=query,
+                vector_queries=[vector_query],
+                top=5,
+                select=["title", "content", "source", "page_number"],
+            )
 
-                    context_blocks.append(
-                        f"FUENTE: {result.get('title', 'Sin título')}\n"
-                        f"METADATOS: Archivo {result.get('source')}, Página {page_label}\n"
-                        f"CONTENIDO: {result.get('content')}"
-                    )
+            results_list = [result async for result in results]
+            context_blocks = []
+            raw_docs = []
 
-                    raw_docs.append(
-                        {
-                            "source": result.get("source"),
-                            "page_number": page,
-                            "title": result.get("title"),
-                            "url": result.get("url") or "#",
-                        }
+            for result in results_list:
+                title = result.get("title")
+                source = result.get("source")
+                page = result.get("page_number")
+                context_blocks.append(
+                    CONTEXT_BLOCK_TEMPLATE.format(
+                        title=title if title is not None else "Sin título",
+                        source=source,
+                        page=page if page is not None else "N/A",
+                        content=result.get("content"),
                     )
-
-                logger.info(
-                    f"search_technical_docs - Búsqueda completada, {result_count} resultados encontrados"
+                )
+                raw_docs.append(
+                    {
+                        "source": source,
+                        "page_number": page,
+                        "title": title,
+                        "url": result.get("url") or "#",
+                    }
                 )
 
-                result_dict = {
-                    "content": "\n\n---\n\n".join(context_blocks) if context_blocks else "",
-                    "value": raw_docs,
-                }
+            logger.debug(
+                "search_technical_docs - Búsqueda completada, %d resultados encontrados",
+                len(results_list),
+            )
 
-                logger.info(
-                    "search_technical_docs - Retornando resultado: "
-                    f"content_length={len(result_dict['content'])}, "
-                    f"docs_count={len(result_dict['value'])}"
-                )
-                return result_dict
+            result_dict = {
+                "content": "\n\n---\n\n".join(context_blocks) if context_blocks else "",
+                "value": raw_docs,
+            }
+
+            logger.info(
+                "search_technical_docs - Retornando resultado: "
+                f"content_length={len(result_dict['content'])}, "
+                f"docs_count={len(result_dict['value'])}"
+            )
+            self.query_cache.store(query_vector, result_dict)
+            return result_dict
 
         except Exception as e:
             logger.error(f"search_technical_docs - Error en búsqueda técnica: {e}", exc_info=True)
@@ -120,52 +180,150 @@ class AzureAISearchService(SearchPort):
             logger.warning("search_technical_docs - Retornando resultado de error")
             return error_result
 
-    async def create_or_update_index(self, index_name: str, vector_dimensions: int):
+    @staticmethod
+    def _build_index(index_name: str, vector_dimensions: int) -> SearchIndex:
+        fields = [
+            SimpleField(name="id", type=SearchFieldDataType.String, key=True),
+            SearchableField(name="title", type=SearchFieldDataType.String),
+            SearchableField(name="content", type=SearchFieldDataType.String),
+            SearchField(
+                name="content_vector",
+                type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
+                vector_search_dimensions=vector_dimensions,
+                vector_search_profile_name="default-vector-profile",
+            ),
+            SimpleField(name="category", type=SearchFieldDataType.String),
+            SimpleField(name="source", type=SearchFieldDataType.String),
+            SimpleField(name="page_number", type=SearchFieldDataType.Int32),
+        ]
+
+        vector_search = VectorSearch(
+            algorithms=[
+                HnswAlgorithmConfiguration(
+                    name="default-hnsw", parameters=HnswParameters(metric="cosine")
+                )
+            ],
+            profiles=[
+                VectorSearchProfile(
+                    name="default-vector-profile",
+                    algorithm_configuration_name="default-hnsw",
+                    compression_name=VECTOR_COMPRESSION_NAME,
+                )
+            ],
+            # Cuantización escalar int8 en el servicio: ~4x menos memoria para el grafo HNSW
+            compressions=[
+                ScalarQuantizationCompression(
+                    compression_name=VECTOR_COMPRESSION_NAME,
+                    parameters=ScalarQuantizationParameters(quantized_data_type="int8"),
+                )
+            ],
+        )
+
+        return SearchIndex(
+            name=index_name,
+            fields=fields,
+            vector_search=vector_search,
+        )
+
+    def schema_hash(self, vector_dimensions: int) -> str:
+        index = self._build_index("schema", vector_dimensions)
+        spec = {
+            "fields": [
+                {
+                    "name": f.name,
+                    "type": str(f.type),
+                    "key": bool(f.key),
+                    "searchable": bool(f.searchable),
+                    "dimensions": f.vector_search_dimensions,
+                    "profile": f.vector_search_profile_name,
+                }
+                for f in index.fields
+            ],
+            "algorithms": [
+                {"name": a.name, "metric": str(a.parameters.metric)}
+                for a in index.vector_search.algorithms
+            ],
+            "profiles": [
+                {
+                    "name": p.name,
+                    "algorithm": p.algorithm_configuration_name,
+                    "compression": p.compression_name,
+                }
+                for p in index.vector_search.profiles
+            ],
+            "compressions": [
+                {
+                    "name": c.compression_name,
+                    "type": str(c.parameters.quantized_data_type),
+                }
+                for c in index.vector_search.compressions
+            ],
+        }
+        return hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()
+
+    async def index_exists(self, index_name: str) -> bool:
         try:
-            fields = [
-                SimpleField(name="id", type=SearchFieldDataType.String, key=True),
-                SearchableField(name="title", type=SearchFieldDataType.String),
-                SearchableField(name="content", type=SearchFieldDataType.String),
-                SearchField(
-                    name="content_vector",
-                    type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
-                    vector_search_dimensions=vector_dimensions,
-                    vector_search_profile_name="default-vector-profile",
-                ),
-                SimpleField(name="category", type=SearchFieldDataType.String),
-                SimpleField(name="source", type=SearchFieldDataType.String),
-                SimpleField(name="page_number", type=SearchFieldDataType.Int32),
-            ]
-
-            vector_search = VectorSearch(
-                algorithms=[
-                    HnswAlgorithmConfiguration(
-                        name="default-hnsw", parameters=HnswParameters(metric="cosine")
-                    )
-                ],
-                profiles=[
-                    VectorSearchProfile(
-                        name="default-vector-profile",
-                        algorithm_configuration_name="default-hnsw",
-                    )
-                ],
-            )
+            await self.index_client.get_index(index_name)
+            return True
+        except ResourceNotFoundError:
+            return False
 
-            index = SearchIndex(
-                name=index_name,
-                fields=fields,
-                vector_search=vector_search,
-            )
+    async def create_or_update_index(self, index_name: str, vector_dimensions: int):
+        try:
+            index = self._build_index(index_name, vector_dimensions)
             await self.index_client.create_or_update_index(index)
             logger.info(f"Índice '{index_name}' actualizado.")
         except Exception as e:
             logger.error(f"Error creando índice: {e}")
             raise e
 
+    @staticmethod
+    def _initial_batch_size(vectors: List[Dict[str, Any]]) -> int:
+        sample = vectors[:10]
+        avg_bytes = max(1, sum(len(orjson.dumps(doc)) for doc in sample) // len(sample))
+        return max(1, min(MAX_BATCH_ACTION_COUNT, MAX_BATCH_BYTES // avg_bytes))
+
     async def upsert_vectors(self, index_name: str, vectors: List[Dict[str, Any]]):
-        async with SearchClient(self.endpoint, index_name, self.credential) as client:
-            results = await client.upload_documents(documents=vectors)
-            return {
-                "total_success": sum(1 for r in results if r.succeeded),
-                "total_failed": sum(1 for r in results if not r.succeeded),
-            }
+        counters = {"total_success": 0, "total_failed": 0}
+        if not vectors:
+            return counters
+
+        # Tamaño de lote según bytes por documento: los vectores inflan cada petición
+        batch_size = self._initial_batch_size(vectors)
+        logger.info(f"upsert_vectors - Tamaño de lote: {batch_size}")
+
+        # Tiempos medidos desde los callbacks: sin flush forzado entre lotes
+        window = {"started": time.monotonic(), "acked": 0}
+
+        def _on_ack() -> None:
+            window["acked"] += 1
+            if window["acked"] == batch_size:
+                now = time.monotonic()
+                logger.info(
+                    f"upsert_vectors - Lote de {batch_size} docs confirmado en "
+                    f"{now - window['started']:.2f}s"
+                )
+                window["started"], window["acked"] = now, 0
+
+        # El sender asíncrono hace await de sus callbacks: deben ser corutinas
+        async def _on_progress(action) -> None:
+            counters["total_success"] += 1
+            _on_ack()
+
+        async def _on_error(action) -> None:
+            counters["total_failed"] += 1
+            _on_ack()
+
+        # El sender agrupa en lotes, reintenta con backoff (503) y hace el flush final al salir
+        async with SearchIndexingBufferedSender(
+            self.endpoint,
+            index_name,
+            self.credential,
+            auto_flush_interval=60,
+            initial_batch_action_count=batch_size,
+            on_progress=_on_progress,
+            on_error=_on_error,
+        ) as sender:
+            await sender.upload_documents(documents=vectors)
+
+        return counters
@@ -15,7 +15,7 @@ def build_chat_client() -> AzureChatOpenAI:
             api_version=settings.AZURE_OPENAI_API_VERSION,
             azure_deployment=settings.AZURE_OPENAI_CHAT_DEPLOYMENT,
             temperature=0.0,
-            streaming=False,
+            # Sin fijar "streaming": así stream_mode="messages" de LangGraph recibe tokens
             max_retries=3,
             timeout=60.0,
         )
@@ -0,0 +1,23 @@
+from typing import Dict
+
+from psycopg_pool import ConnectionPool
+
+_pools: Dict[str, ConnectionPool] = {}
+
+
+def get_pool(db_url: str) -> ConnectionPool:
+    """
+    Devuelve un pool de conexiones compartido por URL para no abrir
+    una conexión TCP nueva en cada operación.
+    """
+    pool = _pools.get(db_url)
+    if pool is None:
+        pool = ConnectionPool(db_url, min_size=2, max_size=10, open=True)
+        _pools[db_url] = pool
+    return pool
+
+
+def close_pools() -> None:
+    for pool in _pools.values():
+        pool.close()
+    _pools.clear()
@@ -0,0 +1,58 @@
+import hashlib
+import os
+from array import array
+from typing import Dict, List, Optional
+
+from src.adapters.local.db_pool import get_pool
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCacheRepo:
+    def __init__(self, db_url: Optional[str] = None):
+        self.db_url = db_url or os.getenv("DATABASE_URL")
+        if not self.db_url:
+            raise ValueError("DATABASE_URL no configurado")
+        self._init_db()
+
+    def _init_db(self) -> None:
+        with get_pool(self.db_url).connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS embedding_cache (
+                        hash TEXT NOT NULL,
+                        model TEXT NOT NULL,
+                        vector BYTEA NOT NULL,
+                        PRIMARY KEY (hash, model)
+                    )
+                    """
+                )
+
+    def get_many(self, hashes: List[str], model: str) -> Dict[str, List[float]]:
+        if not hashes:
+            return {}
+        with get_pool(self.db_url).connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT hash, vector FROM embedding_cache WHERE hash = ANY(%s) AND model = %s",
+                    (hashes, model),
+                )
+                # Vectores guardados como float32 compacto (4 bytes por dimensión)
+                return {row[0]: array("f", bytes(row[1])).tolist() for row in cur.fetchall()}
+
+    def set_many(self, vectors: Dict[str, List[float]], model: str) -> None:
+        if not vectors:
+            return
+        with get_pool(self.db_url).connection() as conn:
+            with conn.cursor() as cur:
+                cur.executemany(
+                    """
+                    INSERT INTO embedding_cache (hash, model, vector)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (hash, model) DO NOTHING
+                    """,
+                    [(h, model, array("f", v).tobytes()) for h, v in vectors.items()],
+                )
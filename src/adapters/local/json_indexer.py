@@ -1,33 +1,103 @@
-import json
 import logging
+import re
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Set
+
+import orjson
 
 from src.domain.ports.search_port import SearchPort
 
+try:
+    import tantivy
+except ImportError:  # dependencia opcional: se usa el índice invertido en Python
+    tantivy = None
+
 logger = logging.getLogger(__name__)
 
+MAX_RESULTS = 5
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
 
 class LocalJsonSearchService(SearchPort):
     def __init__(self, data_path: str = "data/documents.json"):
         self.data_path = Path(data_path)
+        self._docs: List[Dict[str, Any]] = []
+        self._postings: Dict[str, Set[int]] = {}
+        self._loaded_mtime: Optional[float] = None
+        self._tantivy_index = None
+
+    def _ensure_index(self) -> None:
+        mtime = self.data_path.stat().st_mtime
+        if mtime == self._loaded_mtime:
+            return
+
+        docs = orjson.loads(self.data_path.read_bytes())
+        postings: Dict[str, Set[int]] = {}
+        for doc_id, doc in enumerate(docs):
+            for token in _tokenize(f"{doc.get('title', '')} {doc.get('content', '')}"):
+                postings.setdefault(token, set()).add(doc_id)
+
+        self._docs = docs
+        self._postings = postings
+        self._tantivy_index = self._build_tantivy_index(docs) if tantivy else None
+        self._loaded_mtime = mtime
+        logger.info(
+            f"LocalJsonSearchService - Índice invertido construido: "
+            f"{len(docs)} docs, {len(postings)} términos, "
+            f"tantivy={'sí' if self._tantivy_index else 'no'}"
+        )
+
+    @staticmethod
+    def _build_tantivy_index(docs: List[Dict[str, Any]]):
+        builder = tantivy.SchemaBuilder()
+        builder.add_unsigned_field("doc_id", stored=True)
+        builder.add_text_field("title")
+        builder.add_text_field("content")
+        index = tantivy.Index(builder.build())
+
+        writer = index.writer()
+        for doc_id, doc in enumerate(docs):
+            writer.add_document(
+                tantivy.Document(
+                    doc_id=doc_id,
+                    title=str(doc.get("title", "")),
+                    content=str(doc.get("content", "")),
+                )
+            )
+        writer.commit()
+        index.reload()
+        return index
+
+    def _match_ids(self, query: str) -> List[int]:
+        terms = _tokenize(query)
+        if not terms:
+            return []
+
+        if self._tantivy_index is not None:
+            # Ranking BM25 en Rust; los términos ya tokenizados evitan errores de sintaxis
+            parsed = self._tantivy_index.parse_query(" ".join(terms), ["title", "content"])
+            searcher = self._tantivy_index.searcher()
+            hits = searcher.search(parsed, MAX_RESULTS).hits
+            return [searcher.doc(address)["doc_id"][0] for _, address in hits]
+
+        candidates = set().union(*(self._postings.get(term, ()) for term in terms))
+        return sorted(candidates)[:MAX_RESULTS]
 
     async def search_technical_docs(self, query: str) -> Dict[str, Any]:
         try:
             if not self.data_path.exists():
                 raise FileNotFoundError(f"No existe {self.data_path}")
 
-            docs = json.loads(self.data_path.read_text(encoding="utf-8"))
-            terms = [t.lower() for t in query.split() if t.strip()]
-            matches: List[Dict[str, Any]] = []
-
-            for doc in docs:
-                haystack = f"{doc.get('title', '')} {doc.get('content', '')}".lower()
-                if any(term in haystack for term in terms):
-                    matches.append(doc)
+            self._ensure_index()
+            matches = [self._docs[doc_id] for doc_id in self._match_ids(query)]
 
             context_blocks = []
-            for doc in matches[:5]:
+            for doc in matches:
                 page = doc.get("page_number")
                 page_label = str(page) if page is not None else "N/A"
                 context_blocks.append(
@@ -50,7 +120,7 @@ class LocalJsonSearchService(SearchPort):
                         "title": doc.get("title"),
                         "url": doc.get("url") or "#",
                     }
-                    for doc in matches[:5]
+                    for doc in matches
                 ],
             }
 
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+import orjson
+from langchain_openai import AzureOpenAIEmbeddings
+
+from src.adapters.local.db_pool import get_pool
+from src.domain.ports.search_port import SearchPort
+from src.infrastructure.azure_setup import settings
+from src.infrastructure.micro_batcher import MicroBatcher
+from src.infrastructure.vector_memo import QueryVectorMemo
+
+logger = logging.getLogger(__name__)
+
+
+def _vector_literal(vector: List[float]) -> str:
+    return orjson.dumps(vector).decode()
+
+
+class PostgresSearchService(SearchPort):
+    """
+    Búsqueda vectorial local sobre pgvector (índice HNSW por distancia coseno).
+    Se usa halfvec porque HNSW sobre vector está limitado a 2000 dimensiones.
+    """
+
+    def __init__(self, db_url: Optional[str] = None):
+        self.db_url = db_url or os.getenv("DATABASE_URL")
+        if not self.db_url:
+            raise ValueError("DATABASE_URL no configurado")
+        self.embeddings_model = AzureOpenAIEmbeddings(
+            azure_deployment=settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+            azure_endpoint=str(settings.AZURE_OPENAI_ENDPOINT),
+            api_key=settings.AZURE_OPENAI_API_KEY,
+        )
+        self.query_vectors = QueryVectorMemo()
+        self.embed_batcher = MicroBatcher(
+            self.embeddings_model.aembed_documents,
+            max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_seconds=settings.EMBEDDING_BATCH_WINDOW_MS / 1000,
+        )
+
+    async def aclose(self) -> None:
+        await self.embed_batcher.aclose()
+
+    async def embed_query(self, query: str) -> List[float]:
+        # Memo compartido: la caché de respuestas y la búsqueda del turno reutilizan el vector
+        return await self.query_vectors.get_or_compute(query, self.embed_batcher.submit)
+
+    def _query(self, query_vector: List[float]) -> List[Dict[str, Any]]:
+        with get_pool(self.db_url).connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT title, content, source, page_number
+                    FROM doc_embeddings
+                    ORDER BY embedding <=> %s::halfvec
+                    LIMIT 5
+                    """,
+                    (_vector_literal(query_vector),),
+                    prepare=True,
+                )
+                return [
+                    {"title": row[0], "content": row[1], "source": row[2], "page_number": row[3]}
+                    for row in cur.fetchall()
+                ]
+
+    async def search_technical_docs(self, query: str) -> Dict[str, Any]:
+        try:
+            query_vector = await self.embed_query(query)
+            rows = await asyncio.to_thread(self._query, query_vector)
+
+            context_blocks = []
+            for row in rows:
+                page = row.get("page_number")
+                page_label = str(page) if page is not None else "N/A"
+                context_blocks.append(
+                    f"FUENTE: {row.get('title') or 'Sin título'}\n"
+                    f"METADATOS: Archivo {row.get('source')}, Página {page_label}\n"
+                    f"CONTENIDO: {row.get('content')}"
+                )
+
+            return {
+                "content": "\n\n---\n\n".join(context_blocks) if context_blocks else "",
+                "value": [
+                    {
+                        "source": row.get("source"),
+                        "page_number": row.get("page_number"),
+                        "title": row.get("title"),
+                        "url": "#",
+                    }
+                    for row in rows
+                ],
+            }
+
+        except Exception as e:
+            logger.error(f"PostgresSearchService error: {e}", exc_info=True)
+            return {"content": f"Error al buscar documentos: {str(e)[:200]}", "value": []}
+
+    def _create_table(self, vector_dimensions: int) -> None:
+        with get_pool(self.db_url).connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
+                cur.execute(
+                    f"""
+                    CREATE TABLE IF NOT EXISTS doc_embeddings (
+                        id TEXT PRIMARY KEY,
+                        title TEXT,
+                        content TEXT,
+                        category TEXT,
+                        source TEXT,
+                        page_number INT,
+                        embedding halfvec({int(vector_dimensions)})
+                    )
+                    """
+                )
+                cur.execute(
+                    """
+                    CREATE INDEX IF NOT EXISTS doc_embeddings_hnsw
+                    ON doc_embeddings USING hnsw (embedding halfvec_cosine_ops)
+                    """
+                )
+
+    async def create_or_update_index(self, index_name: str, vector_dimensions: int):
+        # psycopg síncrono en un hilo: no bloquea a los productores/consumidores de la ingesta
+        await asyncio.to_thread(self._create_table, vector_dimensions)
+        logger.info(f"Tabla doc_embeddings lista para '{index_name}'.")
+
+    def _upsert(self, vectors: List[Dict[str, Any]]) -> None:
+        with get_pool(self.db_url).connection() as conn:
+            with conn.cursor() as cur:
+                cur.executemany(
+                    """
+                    INSERT INTO doc_embeddings
+                        (id, title, content, category, source, page_number, embedding)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s::halfvec)
+                    ON CONFLICT (id) DO UPDATE SET
+                        title = EXCLUDED.title,
+                        content = EXCLUDED.content,
+                        category = EXCLUDED.category,
+                        source = EXCLUDED.source,
+                        page_number = EXCLUDED.page_number,
+                        embedding = EXCLUDED.embedding
+                    """,
+                    [
+                        (
+                            doc["id"],
+                            doc.get("title"),
+                            doc.get("content"),
+                            doc.get("category"),
+                            doc.get("source"),
+                            doc.get("page_number"),
+                            _vector_literal(doc["content_vector"]),
+                        )
+                        for doc in vectors
+                    ],
+                )
+
+    async def upsert_vectors(self, index_name: str, vectors: List[Dict[str, Any]]):
+        await asyncio.to_thread(self._upsert, vectors)
+        return {"total_success": len(vectors), "total_failed": 0}
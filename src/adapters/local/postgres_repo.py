@@ -1,9 +1,9 @@
-import json
 import os
 from typing import Any, Optional
 
-import psycopg
+import orjson
 
+from src.adapters.local.db_pool import get_pool
 from src.domain.ports.db_port import DbPort
 
 
@@ -15,7 +15,7 @@ class PostgresRepo(DbPort):
         self._init_db()
 
     def _init_db(self) -> None:
-        with psycopg.connect(self.db_url) as conn:
+        with get_pool(self.db_url).connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -27,17 +27,23 @@ class PostgresRepo(DbPort):
                 )
 
     def get(self, key: str) -> Optional[Any]:
-        with psycopg.connect(self.db_url) as conn:
+        with get_pool(self.db_url).connection() as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT value FROM kv_store WHERE key = %s", (key,))
+                cur.execute(
+                    "SELECT value FROM kv_store WHERE key = %s", (key,), prepare=True
+                )
                 row = cur.fetchone()
                 if not row:
                     return None
-                return json.loads(row[0])
+                return orjson.loads(row[0])
 
     def set(self, key: str, value: Any) -> None:
-        payload = json.dumps(value, ensure_ascii=False, default=str)
-        with psycopg.connect(self.db_url) as conn:
+        payload = orjson.dumps(
+            value,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+            default=str,
+        ).decode()
+        with get_pool(self.db_url).connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -46,4 +52,5 @@ class PostgresRepo(DbPort):
                     ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
                     """,
                     (key, payload),
+                    prepare=True,
                 )
@@ -1,7 +1,54 @@
 import os
 from typing import Any, Dict, Optional
 
-import psycopg
+from src.adapters.local.db_pool import get_pool
+
+# SQL como constantes de módulo: la clave de la caché de sentencias preparadas es estable
+SQL_CREATE_USERS = """
+    CREATE TABLE IF NOT EXISTS users (
+        id SERIAL PRIMARY KEY,
+        google_sub TEXT UNIQUE,
+        email TEXT,
+        name TEXT,
+        picture TEXT,
+        refresh_token TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_login TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+SQL_GET_BY_SUB = """
+    SELECT google_sub, email, name, picture, refresh_token
+    FROM users WHERE google_sub = %s
+"""
+
+SQL_GET_BY_REFRESH_TOKEN = """
+    SELECT google_sub, email, name, picture, refresh_token
+    FROM users WHERE refresh_token = %s
+"""
+
+SQL_UPSERT = """
+    INSERT INTO users (google_sub, email, name, picture, refresh_token)
+    VALUES (%s, %s, %s, %s, %s)
+    ON CONFLICT(google_sub) DO UPDATE SET
+        email = EXCLUDED.email,
+        name = EXCLUDED.name,
+        picture = EXCLUDED.picture,
+        refresh_token = EXCLUDED.refresh_token,
+        last_login = CURRENT_TIMESTAMP
+"""
+
+SQL_REVOKE_REFRESH_TOKEN = "UPDATE users SET refresh_token = NULL WHERE refresh_token = %s"
+
+
+def _row_to_user(row) -> Dict[str, Any]:
+    return {
+        "google_sub": row[0],
+        "email": row[1],
+        "name": row[2],
+        "picture": row[3],
+        "refresh_token": row[4],
+    }
 
 
 class UserRepo:
@@ -12,61 +59,29 @@ class UserRepo:
         self._init_db()
 
     def _init_db(self) -> None:
-        with psycopg.connect(self.db_url) as conn:
+        with get_pool(self.db_url).connection() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS users (
-                        id SERIAL PRIMARY KEY,
-                        google_sub TEXT UNIQUE,
-                        email TEXT,
-                        name TEXT,
-                        picture TEXT,
-                        refresh_token TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        last_login TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                    """
-                )
+                cur.execute(SQL_CREATE_USERS)
 
-    def get_by_sub(self, google_sub: str) -> Optional[Dict[str, Any]]:
-        with psycopg.connect(self.db_url) as conn:
+    def _fetch_one(self, query: str, param: str) -> Optional[Dict[str, Any]]:
+        with get_pool(self.db_url).connection() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT google_sub, email, name, picture, refresh_token
-                    FROM users WHERE google_sub = %s
-                    """,
-                    (google_sub,),
-                )
+                cur.execute(query, (param,), prepare=True)
                 row = cur.fetchone()
-                if not row:
-                    return None
-                return {
-                    "google_sub": row[0],
-                    "email": row[1],
-                    "name": row[2],
-                    "picture": row[3],
-                    "refresh_token": row[4],
-                }
+                return _row_to_user(row) if row else None
+
+    def get_by_sub(self, google_sub: str) -> Optional[Dict[str, Any]]:
+        return self._fetch_one(SQL_GET_BY_SUB, google_sub)
 
     def upsert(
         self, google_sub: str, email: str, name: str, picture: str, refresh_token: str
     ) -> Dict[str, Any]:
-        with psycopg.connect(self.db_url) as conn:
+        with get_pool(self.db_url).connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(
-                    """
-                    INSERT INTO users (google_sub, email, name, picture, refresh_token)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON CONFLICT(google_sub) DO UPDATE SET
-                        email = EXCLUDED.email,
-                        name = EXCLUDED.name,
-                        picture = EXCLUDED.picture,
-                        refresh_token = EXCLUDED.refresh_token,
-                        last_login = CURRENT_TIMESTAMP
-                    """,
+                    SQL_UPSERT,
                     (google_sub, email, name, picture, refresh_token),
+                    prepare=True,
                 )
         return {
             "google_sub": google_sub,
@@ -77,30 +92,9 @@ class UserRepo:
         }
 
     def get_by_refresh_token(self, refresh_token: str) -> Optional[Dict[str, Any]]:
-        with psycopg.connect(self.db_url) as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT google_sub, email, name, picture, refresh_token
-                    FROM users WHERE refresh_token = %s
-                    """,
-                    (refresh_token,),
-                )
-                row = cur.fetchone()
-                if not row:
-                    return None
-                return {
-                    "google_sub": row[0],
-                    "email": row[1],
-                    "name": row[2],
-                    "picture": row[3],
-                    "refresh_token": row[4],
-                }
+        return self._fetch_one(SQL_GET_BY_REFRESH_TOKEN, refresh_token)
 
     def revoke_refresh_token(self, refresh_token: str) -> None:
-        with psycopg.connect(self.db_url) as conn:
+        with get_pool(self.db_url).connection() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    "UPDATE users SET refresh_token = NULL WHERE refresh_token = %s",
-                    (refresh_token,),
-                )
+                cur.execute(SQL_REVOKE_REFRESH_TOKEN, (refresh_token,), prepare=True)
@@ -0,0 +1,13 @@
+from src.domain.ports.search_port import SearchPort
+from src.infrastructure.azure_setup import settings
+
+
+def build_search_service() -> SearchPort:
+    if settings.SEARCH_BACKEND == "postgres":
+        from src.adapters.local.pg_vector_search import PostgresSearchService
+
+        return PostgresSearchService()
+
+    from src.adapters.azure.ai_search import AzureAISearchService
+
+    return AzureAISearchService()
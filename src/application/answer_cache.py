@@ -0,0 +1,50 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+from src.application.nodes.retriever.retriever_node import search_service
+from src.infrastructure.azure_setup import settings
+from src.infrastructure.semantic_cache import SemanticCache
+
+logger = logging.getLogger(__name__)
+
+# Una caché por intención para no mezclar respuestas de categorías distintas
+_caches: Dict[str, SemanticCache] = {}
+
+
+def _cache_for(intention: str) -> SemanticCache:
+    cache = _caches.get(intention)
+    if cache is None:
+        cache = SemanticCache(
+            threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+            max_size=settings.SEMANTIC_CACHE_MAX_SIZE,
+        )
+        _caches[intention] = cache
+    return cache
+
+
+async def _vector_for(text: str) -> Optional[List[float]]:
+    # El adaptador memoriza el vector: lookup (agent), búsqueda y store (finalize) comparten uno
+    return await search_service.embed_query(text.strip())
+
+
+async def lookup_answer(intention: Optional[str], text: str) -> Optional[Dict[str, Any]]:
+    if not intention or not text.strip():
+        return None
+    try:
+        vector = await _vector_for(text)
+        return _cache_for(str(intention)).lookup(vector) if vector is not None else None
+    except Exception as e:
+        logger.warning(f"lookup_answer - Caché de respuestas no disponible: {e}")
+        return None
+
+
+async def store_answer(intention: Optional[str], text: str, answer: Dict[str, Any]) -> None:
+    if not intention or not text.strip():
+        return
+    try:
+        vector = await _vector_for(text)
+        if vector is not None:
+            _cache_for(str(intention)).store(vector, answer)
+    except Exception as e:
+        logger.warning(f"store_answer - No se pudo guardar la respuesta: {e}")
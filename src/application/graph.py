@@ -1,56 +1,127 @@
-import json
+import asyncio
 import logging
+import uuid
+from functools import lru_cache
 from pathlib import Path
 
+import orjson
+
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately, trim_messages
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import END, StateGraph
 
 from src.adapters.azure.openai_client import llm
-from src.application.nodes.classifier.classifier_node import classify_intent
+from src.application.answer_cache import lookup_answer
+from src.application.nodes.classifier.classifier_node import classify_intent, prefilter_intent
 from src.application.nodes.extractor.extractor_node import extractor_node
-from src.application.nodes.retriever.retriever_node import retriever_node, tools
+from src.application.nodes.retriever.retriever_node import (
+    retriever_node,
+    search_service,
+    search_tool,
+    source_docs,
+    tools,
+)
 from src.application.state import GraphState
+from src.domain.entities.schemas import IntentionEnum
+from src.infrastructure.azure_setup import settings
 
 logger = logging.getLogger(__name__)
 
-
-def _get_checkpointer():
-    return MemorySaver()
+# bind_tools serializa los esquemas de las herramientas: se hace una sola vez
+llm_with_tools = llm.bind_tools(tools) if llm and tools else llm
 
 
 async def router_node(state: GraphState) -> dict:
     current_input = state.get("input", "")
     existing_history = state.get("history", [])
 
-    logger.info(f"router_node - Clasificando input: '{current_input[:100]}...'")
-    logger.info(
-        f"router_node - Historial existente tiene {len(existing_history)} mensajes"
+    logger.debug("router_node - Clasificando input: '%.100s...'", current_input)
+    logger.debug(
+        "router_node - Historial existente tiene %d mensajes", len(existing_history)
     )
 
     new_history = [HumanMessage(content=current_input)]
 
-    last_human = next(
-        (m for m in reversed(existing_history) if isinstance(m, HumanMessage)), None
-    )
+    intention = None
+    last_human = None
+    for i in range(len(existing_history) - 1, -1, -1):
+        if existing_history[i].type == "human":
+            last_human = existing_history[i]
+            break
     if last_human:
         if last_human.content.strip() != current_input.strip():
-            logger.info(
+            logger.debug(
                 "router_node - Input diferente detectado (dejar que merge_history decida)"
             )
         else:
-            logger.info("router_node - Mismo input (continuación de conversación)")
+            logger.debug("router_node - Mismo input (continuación de conversación)")
+            intention = state.get("intention")
     else:
-        logger.info("router_node - Primera consulta")
+        logger.debug("router_node - Primera consulta")
 
-    intent_response = await classify_intent(current_input)
-    logger.info(f"router_node - Intención clasificada: {intent_response.intention}")
+    prefetched = None
+    if intention is None:
+        intention, prefetched = await _classify_and_prefetch(current_input)
+    logger.info(f"router_node - Intención clasificada: {intention}")
 
     return {
-        "intention": intent_response.intention,
+        "intention": intention,
         "input": current_input,
         "history": new_history,
+        "prefetched_search": prefetched,
+    }
+
+
+async def _classify_and_prefetch(current_input: str):
+    """
+    Clasifica y, en paralelo, busca con la pregunta literal: para preguntas técnicas
+    el agente arranca con los documentos y se ahorra la primera ida y vuelta a la tool.
+    """
+    prefiltered = prefilter_intent(current_input)
+    if not settings.SPECULATIVE_SEARCH or (
+        prefiltered is not None and prefiltered.intention != IntentionEnum.PREGUNTA_TECNICA
+    ):
+        return (prefiltered or await classify_intent(current_input)).intention, None
+
+    intent_response, search_result = await asyncio.gather(
+        classify_intent(current_input),
+        search_service.search_technical_docs(current_input),
+    )
+    if intent_response.intention != IntentionEnum.PREGUNTA_TECNICA or not search_result.get(
+        "value"
+    ):
+        return intent_response.intention, None
+    return intent_response.intention, search_result
+
+
+def _prefetched_messages(query: str, search_result: dict) -> list:
+    # Par tool_call/ToolMessage sintético, idéntico al que produciría retriever_node
+    tool_call_id = f"prefetch_{uuid.uuid4().hex[:12]}"
+    return [
+        AIMessage(
+            content="",
+            tool_calls=[
+                {"name": search_tool.name, "args": {"query": query}, "id": tool_call_id}
+            ],
+        ),
+        ToolMessage(
+            content=orjson.dumps(search_result, default=str).decode(),
+            tool_call_id=tool_call_id,
+            artifact=source_docs(search_result),
+        ),
+    ]
+
+
+# El contenido de error no depende del tool_call: se serializa una sola vez
+_MISSING_TOOL_CONTENT = orjson.dumps(
+    {
+        "error": "ToolMessage faltante",
+        "message": "No se encontró el ToolMessage correspondiente",
+        "content": "Error al recuperar información de la herramienta.",
+        "value": [],
     }
+).decode()
 
 
 def _validate_and_filter_history(history: list) -> list:
@@ -59,96 +130,131 @@ def _validate_and_filter_history(history: list) -> list:
 
     tool_messages_by_id = {}
     for msg in history:
-        if isinstance(msg, ToolMessage):
+        if msg.type == "tool":
             tool_call_id = getattr(msg, "tool_call_id", None)
             if tool_call_id and tool_call_id not in tool_messages_by_id:
                 tool_messages_by_id[tool_call_id] = msg
 
+    # Comparar msg.type evita recorrer la MRO de isinstance en cada mensaje.
+    # Los ToolMessages solo se emiten detrás de su AIMessage, en el orden de sus tool_calls
     validated_history = []
-    i = 0
-    while i < len(history):
-        msg = history[i]
-
-        if isinstance(msg, AIMessage) and hasattr(msg, "tool_calls") and msg.tool_calls:
-            tool_call_ids = [tc.get("id") for tc in msg.tool_calls if tc.get("id")]
-            validated_history.append(msg)
-
-            for tool_call_id in tool_call_ids:
-                if tool_call_id in tool_messages_by_id:
-                    original_tool_msg = tool_messages_by_id[tool_call_id]
-                    tool_msg = ToolMessage(
-                        content=original_tool_msg.content,
-                        tool_call_id=original_tool_msg.tool_call_id,
-                    )
-                    validated_history.append(tool_msg)
-                else:
-                    error_tool_msg = ToolMessage(
-                        content=json.dumps(
-                            {
-                                "error": "ToolMessage faltante",
-                                "message": "No se encontró el ToolMessage correspondiente",
-                                "content": "Error al recuperar información de la herramienta.",
-                                "value": [],
-                            },
-                            ensure_ascii=False,
-                        ),
-                        tool_call_id=tool_call_id,
-                    )
-                    validated_history.append(error_tool_msg)
-
-            i += 1
-            while i < len(history) and isinstance(history[i], ToolMessage):
-                i += 1
-        else:
-            if not isinstance(msg, ToolMessage):
-                validated_history.append(msg)
-            i += 1
+    append = validated_history.append
+    extend = validated_history.extend
+    for msg in history:
+        if msg.type == "tool":
+            continue
+        append(msg)
+
+        # Los ToolMessages no se mutan aguas abajo: se comparte el original sin copiarlo
+        if msg.type == "ai" and msg.tool_calls:
+            extend(
+                tool_messages_by_id.get(tc["id"])
+                or ToolMessage(content=_MISSING_TOOL_CONTENT, tool_call_id=tc["id"])
+                for tc in msg.tool_calls
+                if tc.get("id")
+            )
 
     return validated_history
 
 
+_SYS_PROMPT_PREFIX = (
+    "Eres un Arquitecto de Azure experto. Tu objetivo es responder ÚNICAMENTE a la ÚLTIMA pregunta del usuario.\n\n"
+    "PREGUNTA ACTUAL DEL USUARIO: '"
+)
+_SYS_PROMPT_SUFFIX = (
+    "'\n\n"
+    "INSTRUCCIONES CRÍTICAS:\n"
+    "1. Responde SOLO a la pregunta actual mencionada arriba.\n"
+    "2. Responde en UN SOLO PÁRRAFO de máximo 12 líneas.\n"
+    "3. Usa ÚNICAMENTE los documentos recuperados que sean RELEVANTES a la pregunta ACTUAL.\n"
+    "4. Si los documentos hablan de SQL pero la pregunta es de Redes, IGNORA los de SQL.\n"
+    "5. Cita SIEMPRE el nombre del archivo que encuentres en los documentos.\n"
+    "6. NO mezcles información de temas distintos.\n"
+    "7. Cuando uses la herramienta de búsqueda, usa SIEMPRE la pregunta ACTUAL del usuario.\n"
+    "8. NO repitas respuestas anteriores. Genera una respuesta NUEVA y ÚNICA basada en la pregunta actual.\n"
+    "9. Si la pregunta cambió, ignora completamente las respuestas anteriores y genera una nueva."
+)
+
+
+@lru_cache(maxsize=128)
+def _system_message(current_input: str) -> SystemMessage:
+    # Una instancia por pregunta: el bucle agent → retriever → agent la reutiliza
+    return SystemMessage(content=_SYS_PROMPT_PREFIX + current_input + _SYS_PROMPT_SUFFIX)
+
+
+def _trim_history(history: list) -> list:
+    """
+    Ventana deslizante sobre el historial: conserva los mensajes más recientes que
+    caben en AGENT_HISTORY_MAX_TOKENS, empezando siempre en un HumanMessage para no
+    separar tool_calls de sus ToolMessages.
+    """
+    trimmed = trim_messages(
+        history,
+        max_tokens=settings.AGENT_HISTORY_MAX_TOKENS,
+        strategy="last",
+        token_counter=count_tokens_approximately,
+        start_on="human",
+    )
+    if not trimmed:
+        # Ni el último turno cabe en el presupuesto: se envía solo ese turno (pregunta y
+        # sus pares tool_call/ToolMessage), nunca el historial completo
+        turn_start = 0
+        for i in range(len(history) - 1, -1, -1):
+            if history[i].type == "human":
+                turn_start = i
+                break
+        trimmed = history[turn_start:]
+        logger.warning(
+            f"agent_node - El último turno supera AGENT_HISTORY_MAX_TOKENS "
+            f"({settings.AGENT_HISTORY_MAX_TOKENS}): se envían solo sus {len(trimmed)} msgs"
+        )
+    if len(trimmed) < len(history):
+        logger.info(f"agent_node - Historial recortado: {len(history)} → {len(trimmed)} msgs")
+    return trimmed
+
+
 async def agent_node(state: GraphState) -> dict:
     history = state.get("history", [])
     current_input = state.get("input", "")
 
-    if not any(isinstance(m, HumanMessage) for m in history):
-        history = [HumanMessage(content=current_input)] + history
-
-    validated_history = _validate_and_filter_history(history)
-
-    sys_msg = SystemMessage(
-        content=(
-            "Eres un Arquitecto de Azure experto. Tu objetivo es responder ÚNICAMENTE a la ÚLTIMA pregunta del usuario.\n\n"
-            f"PREGUNTA ACTUAL DEL USUARIO: '{current_input}'\n\n"
-            "INSTRUCCIONES CRÍTICAS:\n"
-            "1. Responde SOLO a la pregunta actual mencionada arriba.\n"
-            "2. Responde en UN SOLO PÁRRAFO de máximo 12 líneas.\n"
-            "3. Usa ÚNICAMENTE los documentos recuperados que sean RELEVANTES a la pregunta ACTUAL.\n"
-            "4. Si los documentos hablan de SQL pero la pregunta es de Redes, IGNORA los de SQL.\n"
-            "5. Cita SIEMPRE el nombre del archivo que encuentres en los documentos.\n"
-            "6. NO mezcles información de temas distintos.\n"
-            "7. Cuando uses la herramienta de búsqueda, usa SIEMPRE la pregunta ACTUAL del usuario.\n"
-            "8. NO repitas respuestas anteriores. Genera una respuesta NUEVA y ÚNICA basada en la pregunta actual.\n"
-            "9. Si la pregunta cambió, ignora completamente las respuestas anteriores y genera una nueva."
-        )
-    )
+    # router_node abre cada turno con su HumanMessage: solo falta si se invoca el nodo suelto
+    if not history:
+        history = [HumanMessage(content=current_input)]
+
+    # Solo en la primera pasada del turno: tras un tool_call ya no hay atajo posible
+    if history and history[-1].type == "human":
+        cached = await lookup_answer(state.get("intention"), current_input)
+        if cached is not None:
+            logger.info("agent_node - Respuesta servida desde la caché semántica")
+            cached_msg = AIMessage(
+                content=cached["response"],
+                response_metadata={"semantic_cache": True, "sources": cached["sources"]},
+            )
+            return {"history": [cached_msg], "input": current_input}
+
+    prefetched = state.get("prefetched_search")
+    prefetched_msgs = []
+    if prefetched and history and history[-1].type == "human":
+        prefetched_msgs = _prefetched_messages(current_input, prefetched)
+        history = [*history, *prefetched_msgs]
+
+    validated_history = _trim_history(_validate_and_filter_history(history))
+
+    sys_msg = _system_message(current_input)
 
     try:
         if not llm:
             raise ValueError("LLM no está inicializado correctamente")
 
-        if not tools:
-            response = await llm.ainvoke([sys_msg] + validated_history)
-        else:
-            model_with_tools = llm.bind_tools(tools)
-            response = await model_with_tools.ainvoke([sys_msg] + validated_history)
+        response = await llm_with_tools.ainvoke([sys_msg] + validated_history)
 
         if not response:
             raise ValueError("El LLM no generó una respuesta válida")
 
         return {
-            "history": history + [response],
+            "history": [*prefetched_msgs, response],
             "input": current_input,
+            "prefetched_search": None,
         }
     except Exception as e:
         error_message = str(e)
@@ -175,7 +281,7 @@ async def agent_node(state: GraphState) -> dict:
         if hasattr(error_msg, "tool_calls"):
             error_msg.tool_calls = None
 
-        return {"history": history + [error_msg], "input": current_input}
+        return {"history": [error_msg], "input": current_input, "prefetched_search": None}
 
 
 async def out_of_domain_node(state: GraphState) -> dict:
@@ -183,7 +289,40 @@ async def out_of_domain_node(state: GraphState) -> dict:
     return {
         "response": msg,
         "sources": [],
-        "history": state.get("history", []) + [AIMessage(content=msg)],
+        "history": [AIMessage(content=msg)],
+    }
+
+
+_GREETING_SYSTEM_MSG = SystemMessage(
+    content=(
+        "Eres un Arquitecto de Azure experto. Responde al saludo del usuario en una o dos "
+        "frases, de forma cordial, y ofrece tu ayuda con temas técnicos de Microsoft Azure."
+    )
+)
+_GREETING_FALLBACK = "¡Hola! ¿En qué puedo ayudarte con Microsoft Azure?"
+
+
+async def greeting_node(state: GraphState) -> dict:
+    """
+    Saludos: una sola llamada al LLM sin herramientas ni paso por agent/finalize.
+    """
+    current_input = state.get("input", "")
+    message_id = None
+    try:
+        response = await llm.ainvoke(
+            [_GREETING_SYSTEM_MSG, HumanMessage(content=current_input)]
+        )
+        msg = response.content or _GREETING_FALLBACK
+        # Mismo id que el mensaje ya emitido en streaming: LangGraph no lo reenvía como token
+        message_id = response.id
+    except Exception as e:
+        logger.error(f"greeting_node - Error generando saludo: {e}")
+        msg = _GREETING_FALLBACK
+
+    return {
+        "response": msg,
+        "sources": [],
+        "history": [AIMessage(content=msg, id=message_id)],
     }
 
 
@@ -202,8 +341,11 @@ def should_continue(state: GraphState):
 
 
 def route_after_classifier(state: GraphState):
-    if state.get("intention") == "FUERA_DE_DOMINIO":
+    intention = state.get("intention")
+    if intention == "FUERA_DE_DOMINIO":
         return "out_of_domain"
+    if intention == "SALUDO":
+        return "greeting"
     return "agent"
 
 
@@ -214,6 +356,7 @@ workflow.add_node("agent", agent_node)
 workflow.add_node("retriever", retriever_node)
 workflow.add_node("finalize", extractor_node)
 workflow.add_node("out_of_domain", out_of_domain_node)
+workflow.add_node("greeting", greeting_node)
 
 workflow.set_entry_point("router")
 workflow.add_conditional_edges("router", route_after_classifier)
@@ -223,9 +366,9 @@ workflow.add_conditional_edges(
 workflow.add_edge("retriever", "agent")
 workflow.add_edge("finalize", END)
 workflow.add_edge("out_of_domain", END)
+workflow.add_edge("greeting", END)
+
 
 def build_graph(checkpointer=None):
+    # Producción pasa el AsyncSqliteSaver compartido (routes); MemorySaver solo para pruebas locales
     return workflow.compile(checkpointer=checkpointer or MemorySaver())
-
-
-app = build_graph(_get_checkpointer())
@@ -1,3 +1,7 @@
-from src.application.nodes.classifier.classifier_node import classify_intent, classifier_node
+from src.application.nodes.classifier.classifier_node import (
+    classifier_node,
+    classify_intent,
+    classify_intents,
+)
 
-__all__ = ["classify_intent", "classifier_node"]
+__all__ = ["classify_intent", "classify_intents", "classifier_node"]
@@ -1,4 +1,10 @@
+import asyncio
 import logging
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 
 from langchain_core.messages import HumanMessage, SystemMessage
 
@@ -10,23 +16,79 @@ logger = logging.getLogger(__name__)
 
 structured_llm = build_structured_llm(llm)
 
+INTENT_CACHE_MAX_SIZE = 1024
+INTENT_CACHE_TTL_SECONDS = 300.0
+_WORD_RE = re.compile(r"\w+")
 
-async def classify_intent(text: str) -> IntentionResponse:
-    system_instruction = (
-        "Eres un clasificador experto para un asistente de Microsoft Azure.\n"
-        "Categoriza la entrada según estas reglas:\n"
-        "1. SALUDO: Cortesías y charlas breves.\n"
-        "2. PREGUNTA_TECNICA: Dudas sobre servicios de Azure (VNet, SQL, App Service, etc).\n"
-        "3. FUERA_DE_DOMINIO: Temas no relacionados con Azure o tecnología.\n"
-        "\n"
-        "IMPORTANTE: Si la pregunta menciona AWS, Amazon Web Services, Google Cloud, GCP "
-        "o cualquier tecnología que no sea Microsoft Azure, clasifica OBLIGATORIAMENTE "
-        "como FUERA_DE_DOMINIO."
-    )
+_intent_cache: "OrderedDict[str, Tuple[float, IntentionResponse]]" = OrderedDict()
+# Clasificaciones en curso: los envíos duplicados simultáneos esperan la misma llamada
+_inflight: Dict[str, "asyncio.Future[Optional[IntentionResponse]]"] = {}
+
+SYSTEM_INSTRUCTION = (
+    "Eres un clasificador experto para un asistente de Microsoft Azure.\n"
+    "Categoriza la entrada según estas reglas:\n"
+    "1. SALUDO: Cortesías y charlas breves.\n"
+    "2. PREGUNTA_TECNICA: Dudas sobre servicios de Azure (VNet, SQL, App Service, etc).\n"
+    "3. FUERA_DE_DOMINIO: Temas no relacionados con Azure o tecnología.\n"
+    "\n"
+    "IMPORTANTE: Si la pregunta menciona AWS, Amazon Web Services, Google Cloud, GCP "
+    "o cualquier tecnología que no sea Microsoft Azure, clasifica OBLIGATORIAMENTE "
+    "como FUERA_DE_DOMINIO."
+)
+# Mensaje de sistema inmutable: se construye una vez y se comparte entre llamadas
+CLASSIFIER_SYSTEM_MESSAGE = SystemMessage(content=SYSTEM_INSTRUCTION)
+
+
+# Prefiltro sin LLM para los casos evidentes; lo ambiguo sigue yendo al clasificador
+_GREETING_RE = re.compile(
+    r"^\W*(hola|buenas|buenos d[ií]as|buenas tardes|buenas noches|hey|hello|hi|"
+    r"gracias|muchas gracias|adi[oó]s|hasta luego)\W*$",
+    re.IGNORECASE,
+)
+_TECHNICAL_RE = re.compile(
+    r"\b(azure|vnet|nsg|app service|aks|key vault|cosmos ?db|entra id)\b",
+    re.IGNORECASE,
+)
+_OTHER_CLOUD_RE = re.compile(r"\b(aws|amazon|gcp|google cloud)\b", re.IGNORECASE)
+# Solo preguntas cortas de una sola frase: órdenes ("escribe un poema sobre azure") o textos
+# con instrucciones añadidas siguen yendo al LLM, que aplica la regla de fuera de dominio
+_QUESTION_RE = re.compile(
+    r"^\s*¿?\s*(qu[eé]|c[oó]mo|cu[aá]l(?:es)?|cu[aá]ndo|d[oó]nde|por qu[eé]|para qu[eé]|"
+    r"cu[aá]nt[oa]s?|puedo|se puede|es posible)\b[^.!?¡¿\n]*\?\s*$",
+    re.IGNORECASE,
+)
+PREFILTER_MAX_CHARS = 160
+
+
+def prefilter_intent(text: str) -> Optional[IntentionResponse]:
+    if _GREETING_RE.match(text):
+        return IntentionResponse(
+            intention=IntentionEnum.SALUDO, reasoning="Prefiltro: saludo o cortesía."
+        )
+    if (
+        len(text) <= PREFILTER_MAX_CHARS
+        and _QUESTION_RE.match(text)
+        and _TECHNICAL_RE.search(text)
+        and not _OTHER_CLOUD_RE.search(text)
+    ):
+        return IntentionResponse(
+            intention=IntentionEnum.PREGUNTA_TECNICA,
+            reasoning="Prefiltro: pregunta sobre servicios de Azure.",
+        )
+    return None
+
+
+def _cache_key(text: str) -> str:
+    # Ignora mayúsculas, tildes, espacios y puntuación: "¿Qué es una VNet?" == "que es una vnet"
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    without_accents = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(_WORD_RE.findall(without_accents))
 
+
+async def _classify_with_llm(text: str) -> Optional[IntentionResponse]:
     try:
         messages = [
-            SystemMessage(content=system_instruction),
+            CLASSIFIER_SYSTEM_MESSAGE,
             HumanMessage(content=f"Entrada del usuario: '{text}'"),
         ]
 
@@ -36,11 +98,59 @@ async def classify_intent(text: str) -> IntentionResponse:
 
     except Exception as e:
         logger.error(f"Error crítico en clasificación: {str(e)}", exc_info=True)
+        return None
+
+
+async def classify_intent(text: str) -> IntentionResponse:
+    prefiltered = prefilter_intent(text)
+    if prefiltered is not None:
+        logger.info(f"classify_intent - Prefiltro: {prefiltered.intention}")
+        return prefiltered
+
+    cache_key = _cache_key(text)
+    now = time.monotonic()
+    entry = _intent_cache.get(cache_key)
+    if entry is not None:
+        expires_at, cached = entry
+        if expires_at > now:
+            _intent_cache.move_to_end(cache_key)
+            logger.info(f"classify_intent - Cache hit: {cached.intention}")
+            return cached
+        del _intent_cache[cache_key]
+
+    future = _inflight.get(cache_key)
+    if future is None:
+        future = asyncio.ensure_future(_classify_with_llm(text))
+        _inflight[cache_key] = future
+        future.add_done_callback(lambda _f: _inflight.pop(cache_key, None))
+    result = await asyncio.shield(future)
+
+    if result is None:
         return IntentionResponse(
             intention=IntentionEnum.PREGUNTA_TECNICA,
             reasoning="Fallback por error en el servicio de clasificación.",
         )
 
+    # Solo se memorizan clasificaciones reales, nunca el fallback por error
+    _intent_cache[cache_key] = (now + INTENT_CACHE_TTL_SECONDS, result)
+    if len(_intent_cache) > INTENT_CACHE_MAX_SIZE:
+        _intent_cache.popitem(last=False)
+    return result
+
+
+async def classify_intents(texts: List[str], max_concurrency: int = 10) -> List[IntentionResponse]:
+    """
+    Clasifica varias entradas en paralelo (limitado por max_concurrency), conservando el orden.
+    Cada texto pasa por prefiltro, caché y coalescencia igual que classify_intent.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _bounded(text: str) -> IntentionResponse:
+        async with semaphore:
+            return await classify_intent(text)
+
+    return list(await asyncio.gather(*(_bounded(t) for t in texts)))
+
 
 async def classifier_node(state: dict) -> dict:
     current_input = state.get("input", "")
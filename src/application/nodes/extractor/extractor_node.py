@@ -1,10 +1,21 @@
-import json
 import logging
+import ntpath
+import re
+import sys
 
-from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+import orjson
+
+from src.application.answer_cache import store_answer
 
 logger = logging.getLogger(__name__)
 
+_DOC_SUFFIX_RE = re.compile(r"\.(?:pdf|docx)$", re.IGNORECASE)
+
+
+def _clean_source_name(source_name) -> str:
+    # ntpath separa por "/" y "\\" en un solo paso; internado para compartir el str entre turnos
+    return sys.intern(_DOC_SUFFIX_RE.sub("", ntpath.basename(str(source_name))))
+
 
 async def extractor_node(state: dict) -> dict:
     """
@@ -12,14 +23,15 @@ async def extractor_node(state: dict) -> dict:
     """
     history = state.get("history", [])
 
-    last_ai_msg = next(
-        (
-            m
-            for m in reversed(history)
-            if isinstance(m, AIMessage) and (not m.tool_calls or len(m.tool_calls) == 0)
-        ),
-        None,
-    )
+    # Un único recorrido inverso: la respuesta final y, a continuación, las fuentes del turno
+    last_ai_msg = None
+    ai_index = len(history)
+    for i in range(len(history) - 1, -1, -1):
+        m = history[i]
+        if m.type == "ai" and not m.tool_calls:
+            last_ai_msg = m
+            ai_index = i
+            break
 
     response_text = last_ai_msg.content if last_ai_msg else ""
 
@@ -29,27 +41,45 @@ async def extractor_node(state: dict) -> dict:
         )
         logger.warning("extractor_node - No se encontró respuesta, usando mensaje por defecto")
 
+    if last_ai_msg is not None and last_ai_msg.response_metadata.get("semantic_cache"):
+        return {
+            "response": response_text,
+            "sources": list(last_ai_msg.response_metadata.get("sources", [])),
+        }
+
+    # Turno sin herramientas (la respuesta sigue al HumanMessage): no hay fuentes que buscar
+    if ai_index == 0 or (ai_index < len(history) and history[ai_index - 1].type == "human"):
+        return {"response": response_text, "sources": []}
+
     current_response_sources = []
     seen_keys = set()
+    response_lower = response_text.lower()
+    # Los fragmentos de un mismo archivo comparten nombre: un solo escaneo por nombre
+    name_in_response = {}
 
-    for msg in reversed(history):
-        if isinstance(msg, ToolMessage):
+    for i in range(ai_index - 1, -1, -1):
+        msg = history[i]
+        if msg.type == "tool":
             try:
-                data = json.loads(msg.content) if isinstance(msg.content, str) else msg.content
-                docs = data.get("value", []) if isinstance(data, dict) else []
+                docs = msg.artifact
+                if not isinstance(docs, list):
+                    # ToolMessages de checkpoints anteriores al artifact: se parsea el contenido
+                    data = (
+                        orjson.loads(msg.content) if isinstance(msg.content, str) else msg.content
+                    )
+                    docs = data.get("value", []) if isinstance(data, dict) else []
 
                 for doc in docs:
                     source_name = doc.get("source") or doc.get("title") or ""
-                    clean_name = (
-                        str(source_name)
-                        .split("\\")[-1]
-                        .split("/")[-1]
-                        .replace(".pdf", "")
-                        .replace(".docx", "")
-                    )
+                    clean_name = _clean_source_name(source_name)
 
-                    if clean_name.lower() in response_text.lower():
-                        source_key = f"{clean_name}-{doc.get('page_number')}"
+                    name_lower = clean_name.lower()
+                    cited = name_in_response.get(name_lower)
+                    if cited is None:
+                        cited = name_in_response[name_lower] = name_lower in response_lower
+
+                    if cited:
+                        source_key = (clean_name, doc.get("page_number"))
                         if source_key not in seen_keys:
                             seen_keys.add(source_key)
                             current_response_sources.append(
@@ -63,11 +93,18 @@ async def extractor_node(state: dict) -> dict:
                 logger.debug(f"extractor_node - Error extrayendo fuente: {e}")
                 continue
 
-        if isinstance(msg, HumanMessage):
+        if msg.type == "human":
             break
 
+    # Solo se cachean respuestas fundamentadas en documentos (nunca saludos ni errores)
+    if current_response_sources:
+        await store_answer(
+            state.get("intention"),
+            state.get("input", ""),
+            {"response": response_text, "sources": current_response_sources},
+        )
+
     return {
         "response": response_text,
         "sources": current_response_sources,
-        "history": history,
     }
@@ -1,16 +1,19 @@
-import json
+import asyncio
+import inspect
 import logging
 
+import orjson
+
 from langchain_core.messages import AIMessage, ToolMessage
 from langchain_core.tools import StructuredTool
 from langgraph.prebuilt import ToolNode
 
-from src.adapters.azure.ai_search import AzureAISearchService
+from src.adapters.search_factory import build_search_service
 from src.domain.entities.schemas import SearchTechnicalDocsInput
 
 logger = logging.getLogger(__name__)
 
-search_service = AzureAISearchService()
+search_service = build_search_service()
 search_tool = StructuredTool.from_function(
     coroutine=search_service.search_technical_docs,
     name="search_technical_docs",
@@ -22,6 +25,7 @@ search_tool = StructuredTool.from_function(
     args_schema=SearchTechnicalDocsInput,
 )
 tools = [search_tool]
+tools_by_name = {t.name: t for t in tools}
 tool_node = ToolNode(tools)
 
 logger.info(f"Herramientas configuradas: {[t.name for t in tools]}")
@@ -30,6 +34,191 @@ logger.info(
 )
 
 
+# Payloads de error sin campos variables: serializados una sola vez al importar
+_MISSING_TOOL_CONTENT = orjson.dumps(
+    {
+        "error": "Error ejecutando herramienta",
+        "message": "No se pudo procesar esta herramienta",
+        "content": (
+            "No se pudo ejecutar la herramienta. Por favor, intenta reformular tu pregunta."
+        ),
+        "value": [],
+    }
+).decode()
+_CRITICAL_TOOL_CONTENT = orjson.dumps(
+    {
+        "error": "Error crítico en el sistema",
+        "message": "No se pudo procesar las herramientas correctamente",
+        "content": "Hubo un error al procesar tu solicitud. Por favor, intenta nuevamente.",
+        "value": [],
+    }
+).decode()
+
+
+def _dumps(payload: dict) -> str:
+    return orjson.dumps(
+        payload, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    ).decode()
+
+
+def source_docs(result) -> list:
+    # Solo los campos que usa extractor_node: viajan en el artifact y no se re-parsea el JSON
+    docs = result.get("value", []) if isinstance(result, dict) else []
+    return [
+        {
+            "source": doc.get("source"),
+            "title": doc.get("title"),
+            "page_number": doc.get("page_number"),
+            "url": doc.get("url"),
+        }
+        for doc in docs
+        if isinstance(doc, dict)
+    ]
+
+
+def _error_tool_message(tool_call_id: str, tool_name: str, error: BaseException) -> ToolMessage:
+    return ToolMessage(
+        content=_dumps(
+            {
+                "error": "Error ejecutando herramienta",
+                "message": str(error)[:500],
+                "tool_name": tool_name,
+                "error_type": type(error).__name__,
+                "content": (
+                    f"No se pudo ejecutar la herramienta '{tool_name}'. "
+                    "Por favor, intenta reformular tu pregunta."
+                ),
+                "value": [],
+            }
+        ),
+        tool_call_id=tool_call_id,
+    )
+
+
+def _tool_call_key(tool_call: dict, position: int):
+    # Misma herramienta con los mismos args (orden de claves indiferente) => misma clave
+    try:
+        args = orjson.dumps(tool_call.get("args", {}), option=orjson.OPT_SORT_KEYS)
+    except TypeError:
+        return position
+    return (tool_call.get("name", ""), args)
+
+
+async def _execute_tool_call(tool_call: dict, position: int) -> ToolMessage:
+    """
+    Ejecuta un tool_call y devuelve siempre su ToolMessage (resultado o error).
+    """
+    tool_name = tool_call.get("name", "")
+    tool_call_id = tool_call.get("id", "")
+    tool_args = tool_call.get("args", {})
+
+    logger.debug(
+        "retriever_node - Procesando tool_call: name=%s, id=%s", tool_name, tool_call_id
+    )
+    logger.debug("retriever_node - Args recibidos: %s", tool_args)
+
+    try:
+        if not tool_name:
+            raise ValueError("Tool name está vacío")
+
+        if not tool_call_id:
+            raise ValueError("Tool call ID está vacío")
+
+        tool = tools_by_name.get(tool_name)
+        if not tool:
+            raise ValueError(
+                f"Herramienta '{tool_name}' no encontrada. "
+                f"Herramientas disponibles: {[t.name for t in tools]}"
+            )
+
+        if tool_name == "search_technical_docs":
+            if isinstance(tool_args, dict):
+                query = tool_args.get("query", "")
+                if not query or not isinstance(query, str):
+                    query = str(
+                        tool_args.get(
+                            "query", tool_args.get("text", tool_args.get("input", ""))
+                        )
+                    )
+                    if not query:
+                        raise ValueError(
+                            f"Argumento 'query' no encontrado en tool_args: {tool_args}"
+                        )
+                tool_args = {"query": query}
+            elif isinstance(tool_args, str):
+                tool_args = {"query": tool_args}
+            else:
+                raise ValueError(f"Argumentos inválidos para {tool_name}: {tool_args}")
+
+        logger.debug(
+            "retriever_node - Ejecutando herramienta '%s' con args normalizados: %s",
+            tool_name,
+            tool_args,
+        )
+
+        try:
+            if inspect.iscoroutinefunction(getattr(tool, "ainvoke", None)):
+                result = await tool.ainvoke(tool_args)
+            elif hasattr(tool, "invoke"):
+                # Herramientas síncronas fuera del event loop para no bloquear otras peticiones
+                result = await asyncio.to_thread(tool.invoke, tool_args)
+            else:
+                raise ValueError(
+                    f"Herramienta '{tool_name}' no tiene métodos ainvoke o invoke"
+                )
+
+            logger.debug("retriever_node - Herramienta '%s' ejecutada exitosamente", tool_name)
+
+        except Exception as exec_error:
+            logger.error(
+                f"retriever_node - Error durante ejecución de '{tool_name}': {str(exec_error)}",
+                exc_info=True,
+            )
+            error_msg = _error_tool_message(
+                tool_call_id or f"error_{position}", tool_name, exec_error
+            )
+            logger.warning(
+                f"retriever_node - ToolMessage de error creado para '{tool_name}' "
+                "(en lugar de re-lanzar)"
+            )
+            return error_msg
+
+        if isinstance(result, dict):
+            try:
+                content = _dumps(result)
+            except (TypeError, ValueError) as json_error:
+                logger.warning(
+                    f"retriever_node - Error serializando dict, usando str: {json_error}"
+                )
+                content = _dumps({"content": str(result), "value": []})
+        elif isinstance(result, str):
+            content = _dumps({"content": result, "value": []})
+        else:
+            content = _dumps({"content": str(result), "value": []})
+
+        logger.debug(
+            "retriever_node - ToolMessage creado para '%s' (content_length=%d)",
+            tool_name,
+            len(content),
+        )
+        return ToolMessage(
+            content=content, tool_call_id=tool_call_id, artifact=source_docs(result)
+        )
+
+    except Exception as tool_error:
+        logger.error(
+            f"retriever_node - Error procesando tool_call '{tool_name}': {str(tool_error)}",
+            exc_info=True,
+        )
+        error_msg = _error_tool_message(
+            tool_call_id or f"error_{position}", tool_name, tool_error
+        )
+        logger.warning(
+            f"retriever_node - ToolMessage de error creado para '{tool_name}'"
+        )
+        return error_msg
+
+
 async def retriever_node(state: dict) -> dict:
     """
     Wrapper robusto para ejecutar herramientas del agente.
@@ -42,166 +231,51 @@ async def retriever_node(state: dict) -> dict:
             logger.warning(
                 "retriever_node - Último mensaje no es AIMessage, saltando ejecución"
             )
-            return {"history": history}
+            return {}
 
-        if not hasattr(last_message, "tool_calls") or not last_message.tool_calls:
+        tool_calls = getattr(last_message, "tool_calls", None) or []
+        if not tool_calls:
             logger.warning(
                 "retriever_node - Último mensaje no tiene tool_calls, saltando ejecución"
             )
-            return {"history": history}
+            return {}
 
         logger.info(
-            f"retriever_node - Ejecutando herramientas con historial de {len(history)} mensajes"
-        )
-        logger.info(
-            f"retriever_node - Tool calls detectados: {len(last_message.tool_calls)}"
+            f"retriever_node - Ejecutando {len(tool_calls)} tool calls "
+            f"(historial de {len(history)} mensajes)"
         )
 
-        tool_messages = []
-
-        for tool_call in last_message.tool_calls:
-            tool_name = tool_call.get("name", "")
-            tool_call_id = tool_call.get("id", "")
-            tool_args = tool_call.get("args", {})
-
+        # tool_calls repetidos en el mismo turno comparten una sola ejecución
+        call_keys = [_tool_call_key(tc, i) for i, tc in enumerate(tool_calls)]
+        unique_calls = {}
+        for i, (key, tc) in enumerate(zip(call_keys, tool_calls)):
+            unique_calls.setdefault(key, (tc, i))
+        if len(unique_calls) < len(tool_calls):
             logger.info(
-                f"retriever_node - Procesando tool_call: name={tool_name}, id={tool_call_id}"
+                f"retriever_node - {len(tool_calls) - len(unique_calls)} tool calls duplicados "
+                "reutilizan el resultado de otro"
             )
-            logger.info(f"retriever_node - Args recibidos: {tool_args}")
-
-            try:
-                if not tool_name:
-                    raise ValueError("Tool name está vacío")
 
-                if not tool_call_id:
-                    raise ValueError("Tool call ID está vacío")
-
-                tool = next((t for t in tools if t.name == tool_name), None)
-                if not tool:
-                    raise ValueError(
-                        f"Herramienta '{tool_name}' no encontrada. "
-                        f"Herramientas disponibles: {[t.name for t in tools]}"
-                    )
-
-                if tool_name == "search_technical_docs":
-                    if isinstance(tool_args, dict):
-                        query = tool_args.get("query", "")
-                        if not query or not isinstance(query, str):
-                            query = str(
-                                tool_args.get(
-                                    "query", tool_args.get("text", tool_args.get("input", ""))
-                                )
-                            )
-                            if not query:
-                                raise ValueError(
-                                    f"Argumento 'query' no encontrado en tool_args: {tool_args}"
-                                )
-                        tool_args = {"query": query}
-                    elif isinstance(tool_args, str):
-                        tool_args = {"query": tool_args}
-                    else:
-                        raise ValueError(f"Argumentos inválidos para {tool_name}: {tool_args}")
-
-                logger.info(
-                    f"retriever_node - Ejecutando herramienta '{tool_name}' con args normalizados: {tool_args}"
-                )
-
-                try:
-                    if hasattr(tool, "ainvoke"):
-                        result = await tool.ainvoke(tool_args)
-                    elif hasattr(tool, "invoke"):
-                        result = tool.invoke(tool_args)
-                    else:
-                        raise ValueError(
-                            f"Herramienta '{tool_name}' no tiene métodos ainvoke o invoke"
-                        )
-
-                    logger.info(
-                        f"retriever_node - Herramienta '{tool_name}' ejecutada exitosamente"
-                    )
-
-                except Exception as exec_error:
-                    logger.error(
-                        f"retriever_node - Error durante ejecución de '{tool_name}': {str(exec_error)}",
-                        exc_info=True,
-                    )
-                    error_content = json.dumps(
-                        {
-                            "error": "Error ejecutando herramienta",
-                            "message": str(exec_error)[:500],
-                            "tool_name": tool_name,
-                            "error_type": type(exec_error).__name__,
-                            "content": (
-                                f"No se pudo ejecutar la herramienta '{tool_name}'. "
-                                "Por favor, intenta reformular tu pregunta."
-                            ),
-                            "value": [],
-                        },
-                        ensure_ascii=False,
-                    )
-
-                    error_msg = ToolMessage(
-                        content=error_content,
-                        tool_call_id=tool_call_id if tool_call_id else f"error_{len(tool_messages)}",
-                    )
-                    tool_messages.append(error_msg)
-                    logger.warning(
-                        f"retriever_node - ToolMessage de error creado para '{tool_name}' "
-                        "(en lugar de re-lanzar)"
-                    )
-                    continue
-
-                if isinstance(result, dict):
-                    try:
-                        content = json.dumps(result, ensure_ascii=False, default=str)
-                    except (TypeError, ValueError) as json_error:
-                        logger.warning(
-                            f"retriever_node - Error serializando dict, usando str: {json_error}"
-                        )
-                        content = json.dumps(
-                            {"content": str(result), "value": []}, ensure_ascii=False
-                        )
-                elif isinstance(result, str):
-                    content = json.dumps({"content": result, "value": []}, ensure_ascii=False)
-                else:
-                    content = json.dumps({"content": str(result), "value": []}, ensure_ascii=False)
-
-                tool_msg = ToolMessage(content=content, tool_call_id=tool_call_id)
-                tool_messages.append(tool_msg)
-                logger.info(
-                    f"retriever_node - ToolMessage creado para '{tool_name}' (content_length={len(content)})"
-                )
-
-            except Exception as tool_error:
-                logger.error(
-                    f"retriever_node - Error procesando tool_call '{tool_name}': {str(tool_error)}",
-                    exc_info=True,
-                )
-                error_content = json.dumps(
-                    {
-                        "error": "Error ejecutando herramienta",
-                        "message": str(tool_error)[:500],
-                        "tool_name": tool_name,
-                        "error_type": type(tool_error).__name__,
-                        "content": (
-                            f"No se pudo ejecutar la herramienta '{tool_name}'. "
-                            "Por favor, intenta reformular tu pregunta."
-                        ),
-                        "value": [],
-                    },
-                    ensure_ascii=False,
-                )
+        # Los tool_calls son independientes: se ejecutan en paralelo conservando el orden
+        results = await asyncio.gather(
+            *(_execute_tool_call(tc, i) for tc, i in unique_calls.values()),
+            return_exceptions=True,
+        )
+        results_by_key = dict(zip(unique_calls, results))
 
-                error_msg = ToolMessage(
-                    content=error_content,
-                    tool_call_id=tool_call_id if tool_call_id else f"error_{len(tool_messages)}",
-                )
-                tool_messages.append(error_msg)
-                logger.warning(
-                    f"retriever_node - ToolMessage de error creado para '{tool_name}'"
+        tool_messages = []
+        for i, (key, tc) in enumerate(zip(call_keys, tool_calls)):
+            result = results_by_key[key]
+            tool_call_id = tc.get("id") or f"error_{i}"
+            if isinstance(result, BaseException):
+                result = _error_tool_message(tool_call_id, tc.get("name", ""), result)
+            elif result.tool_call_id != tool_call_id:
+                result = ToolMessage(
+                    content=result.content, tool_call_id=tool_call_id, artifact=result.artifact
                 )
+            tool_messages.append(result)
 
-        tool_call_ids = {tc.get("id") for tc in last_message.tool_calls if tc.get("id")}
+        tool_call_ids = {tc.get("id") for tc in tool_calls if tc.get("id")}
         tool_message_ids = {
             msg.tool_call_id
             for msg in tool_messages
@@ -213,25 +287,15 @@ async def retriever_node(state: dict) -> dict:
         missing_ids = tool_call_ids - tool_message_ids
         if missing_ids:
             logger.error(f"retriever_node - CRÍTICO: Tool calls sin respuesta: {missing_ids}")
-            for tool_call in last_message.tool_calls:
+            for tool_call in tool_calls:
                 if tool_call.get("id") in missing_ids:
                     error_msg = ToolMessage(
-                        content=json.dumps(
-                            {
-                                "error": "Error ejecutando herramienta",
-                                "message": "No se pudo procesar esta herramienta",
-                                "content": (
-                                    "No se pudo ejecutar la herramienta. Por favor, intenta reformular tu pregunta."
-                                ),
-                                "value": [],
-                            },
-                            ensure_ascii=False,
-                        ),
+                        content=_MISSING_TOOL_CONTENT,
                         tool_call_id=tool_call.get("id", f"missing_{len(tool_messages)}"),
                     )
                     tool_messages.append(error_msg)
 
-        return {"history": history + tool_messages}
+        return {"history": tool_messages}
 
     except Exception as wrapper_error:
         logger.critical(
@@ -248,17 +312,7 @@ async def retriever_node(state: dict) -> dict:
                 for tool_call in last_message.tool_calls:
                     tool_call_id = tool_call.get("id", f"error_{len(error_messages)}")
                     error_msg = ToolMessage(
-                        content=json.dumps(
-                            {
-                                "error": "Error crítico en el sistema",
-                                "message": "No se pudo procesar las herramientas correctamente",
-                                "content": (
-                                    "Hubo un error al procesar tu solicitud. Por favor, intenta nuevamente."
-                                ),
-                                "value": [],
-                            },
-                            ensure_ascii=False,
-                        ),
+                        content=_CRITICAL_TOOL_CONTENT,
                         tool_call_id=tool_call_id,
                     )
                     error_messages.append(error_msg)
@@ -267,7 +321,7 @@ async def retriever_node(state: dict) -> dict:
                     "retriever_node - Retornando "
                     f"{len(error_messages)} ToolMessages de error por fallo crítico"
                 )
-                return {"history": history + error_messages}
+                return {"history": error_messages}
 
         logger.warning("retriever_node - No hay tool_calls, devolviendo historial sin cambios")
-        return {"history": history}
+        return {}
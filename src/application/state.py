@@ -1,32 +1,20 @@
-from typing import Annotated, Any, List, Optional, Sequence, TypedDict
+import logging
+from typing import Annotated, Any, Dict, List, Optional, Sequence, TypedDict
 
-from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages
 
+logger = logging.getLogger(__name__)
+
 
 def merge_sources(left: Optional[List[Any]], right: Optional[List[Any]]) -> List[Any]:
     """
-    Mantiene una lista única de fuentes basada en el título y página.
+    Reemplaza las fuentes por las del último turno (ya deduplicadas en extractor_node).
     """
     if right is None:
         return list(left) if left else []
 
-    # Siempre reemplazamos fuentes por las del último turno
     return list(right)
-    unique_sources = []
-    seen_ids = set()
-
-    for s in combined:
-        if isinstance(s, dict):
-            s_id = f"{s.get('title', '')}-{s.get('url', '')}"
-        else:
-            s_id = str(s)
-
-        if s_id not in seen_ids:
-            seen_ids.add(s_id)
-            unique_sources.append(s)
-
-    return unique_sources
 
 
 def merge_history_with_reset(
@@ -37,10 +25,6 @@ def merge_history_with_reset(
     Merge personalizado para el historial que detecta cambios en el input
     y reinicia el historial completamente cuando el último mensaje humano cambia.
     """
-    import logging
-
-    logger = logging.getLogger(__name__)
-
     if not left:
         left = []
     if not right:
@@ -49,36 +33,51 @@ def merge_history_with_reset(
     if not right:
         return list(left) if left else []
 
-    last_human_left = next(
-        (m for m in reversed(left) if isinstance(m, HumanMessage)), None
-    )
+    last_human_left = None
+    for i in range(len(left) - 1, -1, -1):
+        if left[i].type == "human":
+            last_human_left = left[i]
+            break
 
-    first_human_right = next((m for m in right if isinstance(m, HumanMessage)), None)
+    first_human_right = None
+    for m in right:
+        if m.type == "human":
+            first_human_right = m
+            break
 
-    logger.info(f"merge_history - Left: {len(left)} msgs, Right: {len(right)} msgs")
-    if last_human_left:
-        logger.info(
-            f"merge_history - Último humano en left: '{last_human_left.content[:50]}...'"
-        )
-    if first_human_right:
-        logger.info(
-            f"merge_history - Primer humano en right: '{first_human_right.content[:50]}...'"
-        )
+    # El reducer corre en cada transición: no formatear trazas si DEBUG está desactivado
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"merge_history - Left: {len(left)} msgs, Right: {len(right)} msgs")
+        if last_human_left:
+            logger.debug(
+                f"merge_history - Último humano en left: '{last_human_left.content[:50]}...'"
+            )
+        if first_human_right:
+            logger.debug(
+                f"merge_history - Primer humano en right: '{first_human_right.content[:50]}...'"
+            )
 
     if not first_human_right:
-        logger.info("merge_history - Right no tiene HumanMessage, agregando normalmente")
-        return list(left) + list(right)
+        logger.debug("merge_history - Right no tiene HumanMessage, agregando normalmente")
+        return [*left, *right]
 
     if not last_human_left:
-        logger.info("merge_history - Sin historial previo, usando right directamente")
-        return list(right)
+        logger.debug("merge_history - Sin historial previo, usando right directamente")
+        return right if isinstance(right, list) else list(right)
+
+    if (
+        last_human_left is first_human_right
+        or last_human_left.content == first_human_right.content
+    ):
+        logger.debug("merge_history - Mismo input, agregando mensajes normalmente")
+        return [*left, *right]
 
     left_content = last_human_left.content.strip()
     right_content = first_human_right.content.strip()
 
     if right_content == left_content:
-        logger.info("merge_history - Mismo input, agregando mensajes normalmente")
-        return list(left) + list(right)
+        logger.debug("merge_history - Mismo input, agregando mensajes normalmente")
+        return [*left, *right]
 
     has_pending_tool_calls = _has_pending_tool_calls(left)
 
@@ -87,7 +86,7 @@ def merge_history_with_reset(
         logger.warning(
             "merge_history - NO reiniciando - agregando normalmente para completar tool_calls"
         )
-        return list(left) + list(right)
+        return [*left, *right]
 
     logger.warning("merge_history - *** REINICIO COMPLETO DEL HISTORIAL ***")
     logger.warning(
@@ -100,43 +99,36 @@ def merge_history_with_reset(
         f"merge_history - Historial anterior: {len(left)} msgs → Nuevo: {len(right)} msgs"
     )
 
-    return list(right)
+    return right if isinstance(right, list) else list(right)
 
 
 def _has_pending_tool_calls(history: Sequence[BaseMessage]) -> bool:
     if not history:
         return False
 
-    last_ai_with_tools = None
-    for msg in reversed(history):
-        if isinstance(msg, AIMessage) and hasattr(msg, "tool_calls") and msg.tool_calls:
-            last_ai_with_tools = msg
+    ai_index = None
+    for i in range(len(history) - 1, -1, -1):
+        msg = history[i]
+        if msg.type == "ai" and getattr(msg, "tool_calls", None):
+            ai_index = i
             break
 
-    if not last_ai_with_tools:
+    if ai_index is None:
         return False
 
-    tool_call_ids = {tc.get("id") for tc in last_ai_with_tools.tool_calls if tc.get("id")}
-    if not tool_call_ids:
+    pending_ids = {tc.get("id") for tc in history[ai_index].tool_calls if tc.get("id")}
+    if not pending_ids:
         return False
 
-    tool_message_ids = {
-        msg.tool_call_id
-        for msg in history
-        if isinstance(msg, ToolMessage)
-        and hasattr(msg, "tool_call_id")
-        and msg.tool_call_id
-    }
-
-    pending_ids = tool_call_ids - tool_message_ids
-    if pending_ids:
-        import logging
-
-        logger = logging.getLogger(__name__)
-        logger.warning(f"_has_pending_tool_calls - Tool calls pendientes: {pending_ids}")
-        return True
+    # Las respuestas solo pueden venir después del AIMessage: cortamos al cubrirlas todas
+    for msg in history[ai_index + 1 :]:
+        if msg.type == "tool":
+            pending_ids.discard(getattr(msg, "tool_call_id", None))
+            if not pending_ids:
+                return False
 
-    return False
+    logger.warning(f"_has_pending_tool_calls - Tool calls pendientes: {pending_ids}")
+    return True
 
 
 class GraphState(TypedDict):
@@ -146,3 +138,5 @@ class GraphState(TypedDict):
     sources: Annotated[List[Any], merge_sources]
     response: str
     history: Annotated[Sequence[BaseMessage], merge_history_with_reset]
+    # Resultado de la búsqueda especulativa lanzada en paralelo con la clasificación
+    prefetched_search: Optional[Dict[str, Any]]
@@ -1,8 +1,21 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 
 class SearchPort(ABC):
     @abstractmethod
     async def search_technical_docs(self, query: str) -> Dict[str, Any]:
         raise NotImplementedError
+
+    async def embed_query(self, query: str) -> Optional[List[float]]:
+        """
+        Embedding de la consulta; None si el backend no trabaja con vectores
+        (la caché semántica de respuestas queda desactivada).
+        """
+        return None
+
+    async def aclose(self) -> None:
+        """
+        Libera clientes y conexiones del adaptador; por defecto no hay nada que cerrar.
+        """
+        return None
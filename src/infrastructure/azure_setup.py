@@ -1,5 +1,5 @@
 import logging
-from typing import Literal
+from typing import Literal, Optional
 
 from pydantic import Field, HttpUrl, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -23,12 +23,31 @@ class Settings(BaseSettings):
 
     AZURE_OPENAI_CHAT_DEPLOYMENT: str = Field(...)
     AZURE_OPENAI_EMBEDDING_DEPLOYMENT: str = Field(...)
+    # Despliegue "Global Batch" opcional para la ingesta inicial por Batch API
+    AZURE_OPENAI_EMBEDDING_BATCH_DEPLOYMENT: Optional[str] = None
+    # Ventana de historial (tokens aproximados) que se envía al agente en cada llamada
+    AGENT_HISTORY_MAX_TOKENS: int = 4000
 
     # AZURE AI SEARCH
     AZURE_SEARCH_ENDPOINT: HttpUrl = Field(...)
     AZURE_SEARCH_API_KEY: str = Field(...)
     AZURE_SEARCH_INDEX_NAME: str = Field(...)
 
+    # BACKEND DE BÚSQUEDA ("postgres" usa pgvector en local)
+    SEARCH_BACKEND: Literal["azure", "postgres"] = "azure"
+
+    # CACHÉ SEMÁNTICA DE CONSULTAS
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92
+    SEMANTIC_CACHE_TTL_SECONDS: float = 300.0
+    SEMANTIC_CACHE_MAX_SIZE: int = 256
+    # Respuestas finales del agente (por intención), reutilizadas entre consultas parecidas
+    ANSWER_CACHE_TTL_SECONDS: float = 900.0
+    # Lanza la búsqueda con la pregunta literal mientras se clasifica la intención
+    SPECULATIVE_SEARCH: bool = True
+    # Micro-batching de embeddings de consulta entre peticiones concurrentes
+    EMBEDDING_BATCH_MAX_SIZE: int = 16
+    EMBEDDING_BATCH_WINDOW_MS: float = 10.0
+
     # AUTH - GOOGLE OAUTH
     GOOGLE_CLIENT_ID: str = Field(...)
     GOOGLE_CLIENT_SECRET: str = Field(...)
@@ -0,0 +1,95 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+
+class MicroBatcher:
+    """
+    Agrupa las llamadas concurrentes que llegan dentro de una ventana corta
+    en una sola llamada por lotes y reparte cada resultado a su futuro.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int = 16,
+        max_wait_seconds: float = 0.01,
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    def _ensure_worker(self) -> None:
+        # La cola y el worker se atan al event loop en curso (ingesta y API usan loops distintos)
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, item: Any) -> Any:
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_seconds
+            try:
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # Cierre a mitad de ventana: el lote parcial no llegará a despacharse
+                for _, future in batch:
+                    future.cancel()
+                raise
+
+            # El lote se despacha aparte: la siguiente ventana no espera a la API
+            task = loop.create_task(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        try:
+            results = list(await self.batch_fn([item for item, _ in batch]))
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"MicroBatcher - batch_fn devolvió {len(results)} resultados "
+                    f"para {len(batch)} elementos"
+                )
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            # Ningún llamador queda esperando: todos reciben el error del lote
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def aclose(self) -> None:
+        tasks = [t for t in (self._worker, *self._flushes) if t is not None and not t.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Elementos encolados que ya no tendrán lote
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            future.cancel()
+        self._worker = None
+        self._queue = None
@@ -0,0 +1,82 @@
+import hashlib
+import re
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+")
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def _shingle_hashes(text: str, shingle_size: int) -> np.ndarray:
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) < shingle_size:
+        shingles = {" ".join(tokens)}
+    else:
+        shingles = {
+            " ".join(tokens[i : i + shingle_size]) for i in range(len(tokens) - shingle_size + 1)
+        }
+    return np.array(
+        [
+            int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+            for s in shingles
+        ],
+        dtype=np.uint64,
+    )
+
+
+class NearDuplicateFilter:
+    """
+    Detector de duplicados exactos (SHA-256) y casi duplicados
+    (MinHash sobre shingles de palabras + LSH por bandas).
+    """
+
+    def __init__(
+        self, threshold: float = 0.85, num_perm: int = 64, bands: int = 8, shingle_size: int = 5
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm debe ser múltiplo de bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        rng = np.random.RandomState(1)
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        self._exact: Set[str] = set()
+        self._signatures: List[np.ndarray] = []
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = {}
+
+    def _signature(self, text: str) -> np.ndarray:
+        hashes = _shingle_hashes(text, self.shingle_size)
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [
+            (band, signature[band * self.rows : (band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def is_duplicate(self, text: str) -> bool:
+        """Registra el texto si es nuevo; devuelve True si ya se vio uno (casi) igual."""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        if digest in self._exact:
+            return True
+
+        signature = self._signature(text)
+        keys = self._band_keys(signature)
+        candidates = {idx for key in keys for idx in self._buckets.get(key, ())}
+        for idx in candidates:
+            if np.mean(self._signatures[idx] == signature) >= self.threshold:
+                return True
+
+        self._exact.add(digest)
+        position = len(self._signatures)
+        self._signatures.append(signature)
+        for key in keys:
+            self._buckets.setdefault(key, []).append(position)
+        return False
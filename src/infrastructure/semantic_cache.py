@@ -0,0 +1,67 @@
+import time
+from typing import Any, List, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Caché en proceso de resultados indexada por similitud coseno del embedding
+    de la consulta, con expiración por TTL y desalojo LRU.
+    """
+
+    def __init__(self, threshold: float = 0.92, ttl_seconds: float = 300.0, max_size: int = 256):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._matrix: Optional[np.ndarray] = None
+        self._values: List[Any] = []
+        self._expires_at: List[float] = []
+        self._last_used: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        vec = np.ascontiguousarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _remove(self, indices: List[int]) -> None:
+        for i in sorted(indices, reverse=True):
+            del self._values[i]
+            del self._expires_at[i]
+            del self._last_used[i]
+        self._matrix = np.delete(self._matrix, indices, axis=0) if self._values else None
+
+    def _purge_expired(self, now: float) -> None:
+        expired = [i for i, exp in enumerate(self._expires_at) if exp <= now]
+        if expired:
+            self._remove(expired)
+
+    def lookup(self, vector: List[float]) -> Optional[Any]:
+        now = time.monotonic()
+        self._purge_expired(now)
+        if self._matrix is None:
+            return None
+
+        similarities = self._matrix @ self._normalize(vector)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+
+        self._last_used[best] = now
+        return self._values[best]
+
+    def store(self, vector: List[float], value: Any) -> None:
+        now = time.monotonic()
+        self._purge_expired(now)
+        if len(self._values) >= self.max_size:
+            self._remove([int(np.argmin(self._last_used))])
+
+        row = self._normalize(vector)[np.newaxis, :]
+        self._matrix = row if self._matrix is None else np.vstack([self._matrix, row])
+        self._values.append(value)
+        self._expires_at.append(now + self.ttl_seconds)
+        self._last_used.append(now)
@@ -0,0 +1,44 @@
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List
+
+
+class QueryVectorMemo:
+    """
+    LRU de embeddings recientes por texto de consulta. La caché de respuestas y la
+    búsqueda del mismo turno comparten así un único vector en lugar de pedirlo dos veces.
+    """
+
+    def __init__(self, max_size: int = 64):
+        self.max_size = max_size
+        self._vectors: "OrderedDict[str, List[float]]" = OrderedDict()
+        # Embeddings en curso: las peticiones simultáneas del mismo texto esperan la misma llamada
+        self._inflight: Dict[str, "asyncio.Future[List[float]]"] = {}
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    def clear(self) -> None:
+        self._vectors.clear()
+
+    async def get_or_compute(
+        self, text: str, compute: Callable[[str], Awaitable[List[float]]]
+    ) -> List[float]:
+        key = text.strip()
+        vector = self._vectors.get(key)
+        if vector is not None:
+            self._vectors.move_to_end(key)
+            return vector
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(compute(key))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _f: self._inflight.pop(key, None))
+        vector = await asyncio.shield(future)
+
+        self._vectors[key] = vector
+        self._vectors.move_to_end(key)
+        if len(self._vectors) > self.max_size:
+            self._vectors.popitem(last=False)
+        return vector
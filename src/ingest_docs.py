@@ -0,0 +1,328 @@
+"""
+INGESTA: INDEXACIÓN DE DOCUMENTOS LOCALES EN AZURE AI SEARCH
+Uso: uv run python -m src.ingest_docs
+"""
+
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+from langchain_openai import AzureOpenAIEmbeddings
+from openai import AsyncAzureOpenAI
+
+from src.adapters.azure.ai_search import AzureAISearchService
+from src.adapters.local.embedding_cache_repo import EmbeddingCacheRepo, content_hash
+from src.adapters.local.postgres_repo import PostgresRepo
+from src.adapters.search_factory import build_search_service
+from src.infrastructure.azure_setup import settings
+from src.infrastructure.minhash import NearDuplicateFilter
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CHUNK_SIZE = 16
+INGEST_BATCH_SIZE = 256
+EMBEDDING_CONCURRENCY = 4
+UPLOAD_CONCURRENCY = 2
+PIPELINE_QUEUE_SIZE = 4
+
+# Batch API: mitad de coste y cuota separada, solo compensa para corpus grandes
+BATCH_API_MIN_DOCS = 100
+BATCH_API_ENDPOINT = "/embeddings"
+BATCH_API_POLL_SECONDS = 30
+
+
+def _build_embeddings_model() -> AzureOpenAIEmbeddings:
+    return AzureOpenAIEmbeddings(
+        azure_deployment=settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+        azure_endpoint=str(settings.AZURE_OPENAI_ENDPOINT),
+        api_key=settings.AZURE_OPENAI_API_KEY,
+        chunk_size=EMBEDDING_CHUNK_SIZE,
+    )
+
+
+def _doc_text(doc: Dict[str, Any]) -> str:
+    return f"{doc.get('title', '')}: {doc.get('content', '')}"
+
+
+async def _embed_with_batch_api(
+    client: AsyncAzureOpenAI, texts: List[str], deployment: str
+) -> Tuple[List[List[float]], str]:
+    """
+    Devuelve los vectores en el orden de `texts` y el modelo que los generó según la respuesta.
+    """
+    requests_jsonl = b"\n".join(
+        orjson.dumps(
+            {
+                "custom_id": str(i),
+                "method": "POST",
+                "url": BATCH_API_ENDPOINT,
+                "body": {"model": deployment, "input": text},
+            }
+        )
+        for i, text in enumerate(texts)
+    )
+    input_file = await client.files.create(
+        file=("embedding_requests.jsonl", requests_jsonl), purpose="batch"
+    )
+    batch = await client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_API_ENDPOINT,
+        completion_window="24h",
+    )
+    logger.info(f"_embed_with_batch_api - Batch {batch.id} enviado con {len(texts)} textos")
+
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(BATCH_API_POLL_SECONDS)
+        batch = await client.batches.retrieve(batch.id)
+        logger.info(f"_embed_with_batch_api - Batch {batch.id}: {batch.status}")
+
+    if batch.status != "completed" or not batch.output_file_id:
+        raise RuntimeError(f"Batch {batch.id} terminó con estado {batch.status}")
+
+    output = await client.files.content(batch.output_file_id)
+    vectors: Dict[int, List[float]] = {}
+    models = set()
+    for line in output.content.splitlines():
+        if not line.strip():
+            continue
+        item = orjson.loads(line)
+        body = (item.get("response") or {}).get("body") or {}
+        if body.get("data"):
+            vectors[int(item["custom_id"])] = body["data"][0]["embedding"]
+            models.add(body.get("model"))
+
+    missing = len(texts) - len(vectors)
+    if missing:
+        raise RuntimeError(f"Batch {batch.id} sin embedding para {missing} textos")
+    if len(models) != 1:
+        raise RuntimeError(f"Batch {batch.id} con modelos inconsistentes: {models}")
+    return [vectors[i] for i in range(len(texts))], models.pop()
+
+
+async def _interactive_model_info(client: AsyncAzureOpenAI, sample: str) -> Tuple[str, int]:
+    # Modelo y dimensiones reales del despliegue con el que se leerá la caché
+    response = await client.embeddings.create(
+        input=[sample], model=settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT
+    )
+    return response.model, len(response.data[0].embedding)
+
+
+async def _prefill_cache_with_batch_api(
+    texts: List[str], cache: Optional[EmbeddingCacheRepo]
+) -> None:
+    """
+    Genera por Batch API los embeddings que faltan en la caché; el pipeline
+    interactivo los lee después desde la caché.
+    Solo se escriben si el despliegue batch usa el mismo modelo y dimensiones que el
+    interactivo: la caché se indexa por el despliegue interactivo.
+    """
+    deployment = settings.AZURE_OPENAI_EMBEDDING_BATCH_DEPLOYMENT
+    if not deployment or len(texts) < BATCH_API_MIN_DOCS:
+        return
+    if cache is None:
+        logger.warning("_prefill_cache_with_batch_api - Sin caché, se omite Batch API")
+        return
+
+    model = settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT
+    by_hash = {content_hash(text): text for text in texts}
+    cached = await asyncio.to_thread(cache.get_many, list(by_hash), model)
+    pending = {h: text for h, text in by_hash.items() if h not in cached}
+    if len(pending) < BATCH_API_MIN_DOCS:
+        return
+
+    client = AsyncAzureOpenAI(
+        azure_endpoint=str(settings.AZURE_OPENAI_ENDPOINT),
+        api_key=settings.AZURE_OPENAI_API_KEY,
+        api_version=settings.AZURE_OPENAI_API_VERSION,
+    )
+    try:
+        expected_model, expected_dims = await _interactive_model_info(
+            client, next(iter(pending.values()))
+        )
+        vectors, batch_model = await _embed_with_batch_api(
+            client, list(pending.values()), deployment
+        )
+    except Exception as e:
+        logger.error(f"_prefill_cache_with_batch_api - Fallback a API interactiva: {e}")
+        return
+    finally:
+        await client.close()
+
+    if batch_model != expected_model or any(len(v) != expected_dims for v in vectors):
+        logger.warning(
+            "_prefill_cache_with_batch_api - El despliegue batch no coincide con el interactivo "
+            f"({batch_model} vs {expected_model}, {expected_dims} dims): no se cachean sus vectores"
+        )
+        return
+    await asyncio.to_thread(cache.set_many, dict(zip(pending.keys(), vectors)), model)
+
+
+def _open_embedding_cache() -> Optional[EmbeddingCacheRepo]:
+    try:
+        return EmbeddingCacheRepo()
+    except Exception as e:
+        logger.warning(f"_open_embedding_cache - Cache de embeddings no disponible: {e}")
+        return None
+
+
+async def _embed_with_cache(
+    texts: List[str],
+    embeddings_model: AzureOpenAIEmbeddings,
+    cache: Optional[EmbeddingCacheRepo],
+) -> List[List[float]]:
+    if cache is None:
+        return await embeddings_model.aembed_documents(texts)
+
+    model = settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT
+    hashes = [content_hash(text) for text in texts]
+    # psycopg es síncrono: fuera del event loop para no frenar a los demás productores
+    cached = await asyncio.to_thread(cache.get_many, list(set(hashes)), model)
+
+    uncached_idx = [i for i, h in enumerate(hashes) if h not in cached]
+    logger.info(
+        f"_embed_with_cache - {len(texts) - len(uncached_idx)} en cache, "
+        f"{len(uncached_idx)} por generar"
+    )
+
+    if uncached_idx:
+        new_vectors = await embeddings_model.aembed_documents([texts[i] for i in uncached_idx])
+        fresh = {hashes[i]: vector for i, vector in zip(uncached_idx, new_vectors)}
+        await asyncio.to_thread(cache.set_many, fresh, model)
+        cached.update(fresh)
+
+    return [cached[h] for h in hashes]
+
+
+async def _ensure_index(
+    search_service, index_name: str, vector_dimensions: int
+) -> None:
+    if not isinstance(search_service, AzureAISearchService):
+        await search_service.create_or_update_index(index_name, vector_dimensions)
+        return
+
+    schema_hash = search_service.schema_hash(vector_dimensions)
+    key = f"idx:{index_name}"
+    try:
+        repo = PostgresRepo()
+    except Exception as e:
+        logger.warning(f"_ensure_index - No se puede persistir el hash del esquema: {e}")
+        repo = None
+
+    if repo and repo.get(key) == schema_hash and await search_service.index_exists(index_name):
+        logger.info(f"_ensure_index - Esquema de '{index_name}' sin cambios, se omite la actualización")
+        return
+
+    await search_service.create_or_update_index(index_name, vector_dimensions)
+    if repo:
+        repo.set(key, schema_hash)
+
+
+def _drop_near_duplicates(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    dedup = NearDuplicateFilter()
+    unique = [
+        doc
+        for doc in documents
+        if not dedup.is_duplicate(_doc_text(doc))
+    ]
+    if len(unique) < len(documents):
+        logger.info(
+            f"_drop_near_duplicates - {len(documents) - len(unique)} documentos duplicados omitidos"
+        )
+    return unique
+
+
+def _iter_batches(
+    documents: List[Dict[str, Any]], batch_size: int
+) -> Iterator[List[Dict[str, Any]]]:
+    for i in range(0, len(documents), batch_size):
+        yield documents[i : i + batch_size]
+
+
+def _to_index_doc(doc: Dict[str, Any], vector: List[float]) -> Dict[str, Any]:
+    return {
+        "id": doc["id"],
+        "title": doc.get("title"),
+        "content": doc.get("content"),
+        "content_vector": vector,
+        "category": doc.get("category"),
+        "source": doc.get("source"),
+        "page_number": doc.get("page_number"),
+    }
+
+
+async def ingest_json_data(data_path: str = "data/documents.json") -> Dict[str, Any]:
+    path = Path(data_path)
+    if not path.exists():
+        raise FileNotFoundError(f"No existe {path}")
+
+    documents: List[Dict[str, Any]] = orjson.loads(path.read_bytes())
+    if not documents:
+        logger.warning("ingest_json_data - No hay documentos para indexar")
+        return {"total_success": 0, "total_failed": 0}
+
+    logger.info(f"ingest_json_data - {len(documents)} documentos cargados desde {path}")
+    documents = _drop_near_duplicates(documents)
+
+    # Un único cliente de embeddings y una única caché para todo el pipeline
+    embeddings_model = _build_embeddings_model()
+    embedding_cache = await asyncio.to_thread(_open_embedding_cache)
+    await _prefill_cache_with_batch_api([_doc_text(doc) for doc in documents], embedding_cache)
+
+    search_service = build_search_service()
+    index_name = settings.AZURE_SEARCH_INDEX_NAME
+    result = {"total_success": 0, "total_failed": 0}
+    index_lock = asyncio.Lock()
+    index_ready = False
+
+    # Pipeline productor/consumidor: el embedding de un lote se solapa con la subida del anterior
+    queue: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    batches = _iter_batches(documents, INGEST_BATCH_SIZE)
+
+    async def producer() -> None:
+        for batch in batches:
+            # Una sola llamada por lote en lugar de un aembed_query por documento
+            texts = [_doc_text(doc) for doc in batch]
+            embeddings = await _embed_with_cache(texts, embeddings_model, embedding_cache)
+            logger.info(f"ingest_json_data - {len(embeddings)} embeddings generados")
+            await queue.put([_to_index_doc(doc, vector) for doc, vector in zip(batch, embeddings)])
+
+    async def run_producers() -> None:
+        try:
+            await asyncio.gather(*[producer() for _ in range(EMBEDDING_CONCURRENCY)])
+        finally:
+            for _ in range(UPLOAD_CONCURRENCY):
+                await queue.put(None)
+
+    async def consumer() -> None:
+        nonlocal index_ready
+        while True:
+            processed_docs = await queue.get()
+            if processed_docs is None:
+                return
+
+            async with index_lock:
+                if not index_ready:
+                    dimensions = len(processed_docs[0]["content_vector"])
+                    await _ensure_index(search_service, index_name, dimensions)
+                    index_ready = True
+
+            batch_result = await search_service.upsert_vectors(index_name, processed_docs)
+            result["total_success"] += batch_result["total_success"]
+            result["total_failed"] += batch_result["total_failed"]
+
+    try:
+        await asyncio.gather(run_producers(), *[consumer() for _ in range(UPLOAD_CONCURRENCY)])
+    finally:
+        await search_service.aclose()
+
+    logger.info(
+        f"ingest_json_data - Indexación completada: "
+        f"ok={result['total_success']}, fallidos={result['total_failed']}"
+    )
+    return result
+
+
+if __name__ == "__main__":
+    asyncio.run(ingest_json_data())
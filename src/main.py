@@ -3,20 +3,35 @@ MAIN: APLICACIÓN FASTAPI PRINCIPAL
 Punto de entrada minimal.
 """
 
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from src.adapters.local.db_pool import close_pools
 from src.adapters.local.postgres_repo import PostgresRepo
+from src.application.nodes.retriever.retriever_node import search_service
 from src.infrastructure.azure_setup import settings
 from src.routes import router
+from src.routes.routes import close_graph_app
 
 PostgresRepo()
 
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    yield
+    await close_graph_app()
+    await search_service.aclose()
+    close_pools()
+
+
 app = FastAPI(
     title="Azure AI Architect Backend",
     description="Backend RAG con Azure AI Search, LangGraph y Structured Output",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -1,15 +1,21 @@
+import asyncio
 import logging
+import time
 import uuid
-from contextlib import asynccontextmanager
-from typing import Any, List, Optional
+from collections import OrderedDict
+from typing import Annotated, Any, List, Optional, Tuple
 
 import aiosqlite
+import orjson
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
 from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 
 from src.application.graph import build_graph
+from src.application.nodes.classifier import classify_intents
+from src.domain.entities.schemas import IntentionResponse
 from src.routes.deps import get_current_user
 
 logger = logging.getLogger(__name__)
@@ -17,13 +23,41 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-@asynccontextmanager
-async def _sqlite_saver():
-    async with aiosqlite.connect("data/dev_history.db") as conn:
-        if not hasattr(conn, "is_alive"):
-            conn.is_alive = lambda: True  # type: ignore[attr-defined]
-        saver = AsyncSqliteSaver(conn)
-        yield saver
+SQLITE_HISTORY_PATH = "data/dev_history.db"
+
+# Grafo compilado una sola vez por proceso, sobre una conexión SQLite persistente
+_graph_app = None
+_sqlite_conn: Optional[aiosqlite.Connection] = None
+_graph_lock = asyncio.Lock()
+
+# Último input por thread_id: evita leer el checkpointer antes de cada invocación
+LAST_INPUT_CACHE_MAX_SIZE = 10_000
+LAST_INPUT_CACHE_TTL_SECONDS = 3600.0
+_last_inputs: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+
+async def _get_graph_app():
+    global _graph_app, _sqlite_conn
+    if _graph_app is not None:
+        return _graph_app
+
+    async with _graph_lock:
+        if _graph_app is None:
+            conn = await aiosqlite.connect(SQLITE_HISTORY_PATH)
+            if not hasattr(conn, "is_alive"):
+                conn.is_alive = lambda: True  # type: ignore[attr-defined]
+            _sqlite_conn = conn
+            _graph_app = build_graph(AsyncSqliteSaver(conn))
+            logger.info("Grafo compilado con checkpointer SQLite persistente")
+    return _graph_app
+
+
+async def close_graph_app() -> None:
+    global _graph_app, _sqlite_conn
+    if _sqlite_conn is not None:
+        await _sqlite_conn.close()
+    _graph_app = None
+    _sqlite_conn = None
 
 
 class ChatRequest(BaseModel):
@@ -39,49 +73,86 @@ class ChatResponse(BaseModel):
     status: str
 
 
-@router.post("/chat/query", response_model=ChatResponse)
-async def chat_endpoint_json(request: ChatRequest, _user=Depends(get_current_user)):
+CLASSIFY_MAX_TEXTS = 50
+
+
+class ClassifyRequest(BaseModel):
+    texts: List[Annotated[str, Field(min_length=1, max_length=4000)]] = Field(
+        ..., min_length=1, max_length=CLASSIFY_MAX_TEXTS
+    )
+
+
+class ClassifyResponse(BaseModel):
+    results: List[IntentionResponse]
+
+
+def _remember_input(thread_id: str, text: str) -> None:
+    _last_inputs[thread_id] = (time.monotonic() + LAST_INPUT_CACHE_TTL_SECONDS, text)
+    _last_inputs.move_to_end(thread_id)
+    if len(_last_inputs) > LAST_INPUT_CACHE_MAX_SIZE:
+        _last_inputs.popitem(last=False)
+
+
+async def _last_input(graph_app, thread_id: str) -> Optional[str]:
+    entry = _last_inputs.get(thread_id)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+
+    # Fallo de caché (reinicio, otro worker o TTL vencido): se consulta el checkpointer
+    current_state = await graph_app.aget_state({"configurable": {"thread_id": thread_id}})
+    if current_state and current_state.values:
+        return current_state.values.get("input", "")
+    return None
+
+
+async def _resolve_thread_id(graph_app, request: ChatRequest) -> str:
+    """
+    Reutiliza el thread_id del frontend salvo que la pregunta haya cambiado.
+    """
     thread_id = request.thread_id or str(uuid.uuid4())
+    if request.thread_id:
+        try:
+            last_input = await _last_input(graph_app, thread_id)
+            if last_input is not None:
+                if last_input and last_input.strip() != request.text.strip():
+                    old_thread_id = thread_id
+                    thread_id = str(uuid.uuid4())
+                    logger.warning(
+                        "*** INPUT DIFERENTE DETECTADO - GENERANDO NUEVO THREAD_ID ***"
+                    )
+                    logger.warning(f"Input anterior: '{last_input[:50]}...'")
+                    logger.warning(f"Input nuevo: '{request.text[:50]}...'")
+                    logger.warning(f"Thread ID cambiado: {old_thread_id} -> {thread_id}")
+                else:
+                    logger.info(
+                        f"Mismo input detectado, manteniendo thread_id: {thread_id}"
+                    )
+            else:
+                logger.info(
+                    f"No hay estado previo para thread_id: {thread_id}, nueva consulta"
+                )
+        except Exception as e:
+            logger.debug(f"No se pudo obtener estado previo (nueva consulta): {e}")
+    else:
+        logger.info(f"Sin thread_id del frontend, generando nuevo: {thread_id}")
+
+    _remember_input(thread_id, request.text.strip())
+    return thread_id
 
+
+@router.post("/chat/query", response_model=ChatResponse)
+async def chat_endpoint_json(request: ChatRequest, _user=Depends(get_current_user)):
     inputs = {"input": request.text}
-    config = {"configurable": {"thread_id": thread_id}}
 
     try:
-        logger.info(f"Invocando grafo para thread_id: {thread_id}")
+        logger.info(f"Invocando grafo para thread_id: {request.thread_id}")
         logger.info(f"Input: '{request.text[:100]}...'")
 
-        async with _sqlite_saver() as saver:
-            graph_app = build_graph(saver)
-            if request.thread_id:
-                try:
-                    current_state = await graph_app.aget_state(
-                        {"configurable": {"thread_id": thread_id}}
-                    )
-                    if current_state and current_state.values:
-                        last_input = current_state.values.get("input", "")
-                        if last_input and last_input.strip() != request.text.strip():
-                            old_thread_id = thread_id
-                            thread_id = str(uuid.uuid4())
-                            logger.warning(
-                                "*** INPUT DIFERENTE DETECTADO - GENERANDO NUEVO THREAD_ID ***"
-                            )
-                            logger.warning(f"Input anterior: '{last_input[:50]}...'")
-                            logger.warning(f"Input nuevo: '{request.text[:50]}...'")
-                            logger.warning(f"Thread ID cambiado: {old_thread_id} -> {thread_id}")
-                        else:
-                            logger.info(
-                                f"Mismo input detectado, manteniendo thread_id: {thread_id}"
-                            )
-                    else:
-                        logger.info(
-                            f"No hay estado previo para thread_id: {thread_id}, nueva consulta"
-                        )
-                except Exception as e:
-                    logger.debug(f"No se pudo obtener estado previo (nueva consulta): {e}")
-            else:
-                logger.info(f"Sin thread_id del frontend, generando nuevo: {thread_id}")
+        graph_app = await _get_graph_app()
+        thread_id = await _resolve_thread_id(graph_app, request)
+        config = {"configurable": {"thread_id": thread_id}}
 
-            final_state = await graph_app.ainvoke(inputs, config)
+        final_state = await graph_app.ainvoke(inputs, config)
 
         response_text = final_state.get("response", "") if final_state else ""
         if not response_text or not response_text.strip():
@@ -141,6 +212,108 @@ async def chat_endpoint_json(request: ChatRequest, _user=Depends(get_current_use
         raise HTTPException(status_code=500, detail=user_message)
 
 
+# Nodos cuyo texto generado es la respuesta final al usuario
+_STREAMED_NODES = {"agent", "greeting"}
+# Solo texto del modelo: los ToolMessages que emite agent (búsqueda especulativa) no son tokens
+_STREAMED_MESSAGE_TYPES = {"AIMessageChunk", "ai"}
+
+# Comentario SSE periódico: proxies y balanceadores no cortan turnos largos con herramientas
+SSE_PING_SECONDS = 15.0
+_SSE_PING = b": ping\n\n"
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def _sse(payload: dict) -> bytes:
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+
+async def _with_keepalive(events, interval: float = SSE_PING_SECONDS):
+    """
+    Reemite los eventos de `events` e intercala un ping si pasan `interval` segundos sin datos.
+    """
+    iterator = events.__aiter__()
+    next_event = asyncio.ensure_future(iterator.__anext__())
+    try:
+        while True:
+            done, _ = await asyncio.wait({next_event}, timeout=interval)
+            if not done:
+                yield _SSE_PING
+                continue
+            try:
+                event = next_event.result()
+            except StopAsyncIteration:
+                return
+            yield event
+            next_event = asyncio.ensure_future(iterator.__anext__())
+    finally:
+        if not next_event.done():
+            next_event.cancel()
+
+
+@router.post("/chat/stream")
+async def chat_endpoint_stream(request: ChatRequest, _user=Depends(get_current_user)):
+    """
+    Variante SSE de /chat/query: emite los tokens de la respuesta a medida que el LLM
+    los genera y cierra con un evento "end" con fuentes e intención.
+    """
+    graph_app = await _get_graph_app()
+    thread_id = await _resolve_thread_id(graph_app, request)
+    config = {"configurable": {"thread_id": thread_id}}
+
+    async def event_stream():
+        final_state: dict = {}
+        try:
+            async for mode, payload in graph_app.astream(
+                {"input": request.text}, config, stream_mode=["messages", "values"]
+            ):
+                if mode == "values":
+                    final_state = payload
+                    continue
+                chunk, metadata = payload
+                if (
+                    metadata.get("langgraph_node") in _STREAMED_NODES
+                    and chunk.type in _STREAMED_MESSAGE_TYPES
+                    and isinstance(chunk.content, str)
+                    and chunk.content
+                    and not getattr(chunk, "tool_call_chunks", None)
+                ):
+                    yield _sse({"type": "token", "content": chunk.content})
+
+            yield _sse(
+                {
+                    "type": "end",
+                    "thread_id": thread_id,
+                    "intention": str(final_state.get("intention", "UNKNOWN")),
+                    "response": final_state.get("response", ""),
+                    "sources": final_state.get("sources", []),
+                    "status": "success",
+                }
+            )
+        except Exception as e:
+            logger.error(f"chat_endpoint_stream - Error en streaming: {e}", exc_info=True)
+            yield _sse(
+                {
+                    "type": "error",
+                    "thread_id": thread_id,
+                    "message": "Error interno del servidor. Por favor, intenta reformular tu pregunta.",
+                }
+            )
+
+    return StreamingResponse(
+        _with_keepalive(event_stream()), media_type="text/event-stream", headers=_SSE_HEADERS
+    )
+
+
+@router.post("/chat/classify", response_model=ClassifyResponse)
+async def classify_endpoint(request: ClassifyRequest, _user=Depends(get_current_user)):
+    """
+    Clasificación masiva (evaluaciones, cargas por lotes): las entradas se clasifican
+    en paralelo y los resultados conservan el orden de `texts`.
+    """
+    logger.info(f"classify_endpoint - Clasificando {len(request.texts)} entradas")
+    return ClassifyResponse(results=await classify_intents(request.texts))
+
+
 @router.get("/chat/health")
 async def health_check(_user=Depends(get_current_user)):
     return {"status": "healthy"}
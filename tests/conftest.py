@@ -0,0 +1,20 @@
+import os
+
+# Configuración mínima para que Settings valide sin un .env real (nunca se llama a Azure)
+_TEST_ENV = {
+    "AZURE_OPENAI_ENDPOINT": "https://test.openai.azure.com/",
+    "AZURE_OPENAI_API_KEY": "0" * 32,
+    "AZURE_OPENAI_CHAT_DEPLOYMENT": "chat-test",
+    "AZURE_OPENAI_EMBEDDING_DEPLOYMENT": "embedding-test",
+    "AZURE_SEARCH_ENDPOINT": "https://test.search.windows.net",
+    "AZURE_SEARCH_API_KEY": "search-key-test",
+    "AZURE_SEARCH_INDEX_NAME": "index-test",
+    "GOOGLE_CLIENT_ID": "client-test",
+    "GOOGLE_CLIENT_SECRET": "secret-test",
+    "GOOGLE_REDIRECT_URI": "http://localhost:8000/auth/callback",
+    "FRONTEND_URL": "http://localhost:5173",
+    "JWT_SECRET": "jwt-secret-for-tests",
+    "JWT_REFRESH_SECRET": "jwt-refresh-secret-for-tests",
+}
+for _key, _value in _TEST_ENV.items():
+    os.environ.setdefault(_key, _value)
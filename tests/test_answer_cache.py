@@ -0,0 +1,52 @@
+import asyncio
+
+from src.adapters.local import LocalJsonSearchService
+from src.application import answer_cache
+
+
+class FakeVectorSearch:
+    def __init__(self):
+        self.embedded = []
+
+    async def embed_query(self, query):
+        self.embedded.append(query)
+        return [1.0, 0.0, 0.0] if "vnet" in query.lower() else [0.0, 1.0, 0.0]
+
+
+def _reset(monkeypatch, service):
+    monkeypatch.setattr(answer_cache, "search_service", service)
+    monkeypatch.setattr(answer_cache, "_caches", {})
+
+
+def test_local_json_backend_can_be_instantiated_and_disables_the_cache(monkeypatch):
+    service = LocalJsonSearchService()
+    _reset(monkeypatch, service)
+
+    async def scenario():
+        await answer_cache.store_answer("PREGUNTA_TECNICA", "¿Qué es una VNet?", {"response": "r"})
+        return await answer_cache.lookup_answer("PREGUNTA_TECNICA", "¿Qué es una VNet?")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_answers_are_served_per_intention(monkeypatch):
+    _reset(monkeypatch, FakeVectorSearch())
+    answer = {"response": "Una VNet es...", "sources": [{"title": "redes.pdf"}]}
+
+    async def scenario():
+        await answer_cache.store_answer("PREGUNTA_TECNICA", "¿Qué es una VNet?", answer)
+        return (
+            await answer_cache.lookup_answer("PREGUNTA_TECNICA", "que es una vnet"),
+            await answer_cache.lookup_answer("SALUDO", "que es una vnet"),
+            await answer_cache.lookup_answer("PREGUNTA_TECNICA", "¿Qué es un NSG?"),
+        )
+
+    same_intent, other_intent, other_question = asyncio.run(scenario())
+
+    assert same_intent == answer
+    assert other_intent is None
+    assert other_question is None
+
+
+def test_adapters_without_resources_close_cleanly():
+    asyncio.run(LocalJsonSearchService().aclose())
@@ -0,0 +1,155 @@
+import asyncio
+import importlib
+
+import orjson
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from src.application import graph
+from src.routes import routes
+from src.routes.deps import get_current_user
+
+# El paquete reexporta la función extractor_node con el mismo nombre que su módulo
+extractor_module = importlib.import_module("src.application.nodes.extractor.extractor_node")
+
+ANSWER = "Una VNet aísla tus recursos. Más detalle en redes-azure."
+SEARCH_RESULT = {
+    "content": "FUENTE: Redes\nMETADATOS: Archivo redes-azure.pdf, Página 3\nCONTENIDO: ...",
+    "value": [{"source": "redes-azure.pdf", "page_number": 3, "title": "Redes", "url": "#"}],
+}
+
+
+class FakeSearch:
+    def __init__(self):
+        self.queries = []
+
+    async def search_technical_docs(self, query):
+        self.queries.append(query)
+        return SEARCH_RESULT
+
+
+async def _no_cached_answer(intention, text):
+    return None
+
+
+async def _skip_store(intention, text, answer):
+    return None
+
+
+@pytest.fixture
+def client(monkeypatch):
+    search = FakeSearch()
+    monkeypatch.setattr(graph, "search_service", search)
+    monkeypatch.setattr(graph, "lookup_answer", _no_cached_answer)
+    monkeypatch.setattr(extractor_module, "store_answer", _skip_store)
+    monkeypatch.setattr(routes, "_graph_app", graph.build_graph())
+    routes._last_inputs.clear()
+
+    app = FastAPI()
+    app.include_router(routes.router)
+    app.dependency_overrides[get_current_user] = lambda: {"google_sub": "test"}
+    test_client = TestClient(app)
+    test_client.search = search
+    return test_client
+
+
+def _use_llm(monkeypatch, *responses):
+    fake = GenericFakeChatModel(messages=iter(responses))
+    monkeypatch.setattr(graph, "llm", fake)
+    monkeypatch.setattr(graph, "llm_with_tools", fake)
+
+
+def _events(response):
+    return [
+        orjson.loads(block[len("data: ") :])
+        for block in response.text.split("\n\n")
+        if block.startswith("data: ")
+    ]
+
+
+def test_prefetched_turn_streams_only_answer_text(client, monkeypatch):
+    _use_llm(monkeypatch, AIMessage(content=ANSWER))
+
+    response = client.post("/chat/stream", json={"text": "¿Qué es una VNet en Azure?"})
+
+    assert response.status_code == 200
+    events = _events(response)
+    tokens = [e["content"] for e in events if e["type"] == "token"]
+    assert client.search.queries == ["¿Qué es una VNet en Azure?"]
+    assert "".join(tokens) == ANSWER
+    assert not any("FUENTE" in token or "value" in token for token in tokens)
+    assert events[-1]["type"] == "end"
+
+
+def test_technical_turn_ends_with_sources_and_thread_id(client, monkeypatch):
+    _use_llm(monkeypatch, AIMessage(content=ANSWER))
+
+    response = client.post(
+        "/chat/stream", json={"text": "¿Qué es una VNet en Azure?", "thread_id": "hilo-1"}
+    )
+
+    end = _events(response)[-1]
+    assert end["type"] == "end"
+    assert end["thread_id"] == "hilo-1"
+    assert end["response"] == ANSWER
+    assert end["sources"] == [{"title": "redes-azure.pdf", "page": 3, "url": "#"}]
+    assert end["status"] == "success"
+
+
+def test_greeting_streams_tokens_then_end_without_searching(client, monkeypatch):
+    _use_llm(monkeypatch, AIMessage(content="¡Hola! ¿En qué te ayudo con Azure?"))
+
+    response = client.post("/chat/stream", json={"text": "hola"})
+
+    events = _events(response)
+    assert [e["type"] for e in events[:-1]] == ["token"] * (len(events) - 1)
+    assert "".join(e["content"] for e in events[:-1]) == "¡Hola! ¿En qué te ayudo con Azure?"
+    assert events[-1]["type"] == "end"
+    assert "SALUDO" in events[-1]["intention"]
+    assert events[-1]["sources"] == []
+    assert client.search.queries == []
+
+
+def test_graph_failure_is_reported_as_an_error_event(client, monkeypatch):
+    class BrokenGraph:
+        async def astream(self, *args, **kwargs):
+            raise RuntimeError("checkpointer caído")
+            yield  # pragma: no cover
+
+    monkeypatch.setattr(routes, "_graph_app", BrokenGraph())
+
+    response = client.post("/chat/stream", json={"text": "¿Qué es una VNet en Azure?"})
+
+    events = _events(response)
+    assert [e["type"] for e in events] == ["error"]
+    assert "checkpointer" not in events[0]["message"]
+
+
+def test_stream_disables_proxy_buffering(client, monkeypatch):
+    _use_llm(monkeypatch, AIMessage(content="¡Hola!"))
+
+    response = client.post("/chat/stream", json={"text": "hola"})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.headers["x-accel-buffering"] == "no"
+
+
+def test_keepalive_pings_while_the_graph_is_silent():
+    async def slow_events():
+        yield b"data: 1\n\n"
+        await asyncio.sleep(0.05)
+        yield b"data: 2\n\n"
+
+    async def collect():
+        return [event async for event in routes._with_keepalive(slow_events(), interval=0.02)]
+
+    events = asyncio.run(collect())
+
+    assert events[0] == b"data: 1\n\n"
+    assert events[-1] == b"data: 2\n\n"
+    assert set(events[1:-1]) == {b": ping\n\n"}
+    assert len(events) >= 3
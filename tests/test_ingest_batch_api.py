@@ -0,0 +1,135 @@
+import asyncio
+from types import SimpleNamespace
+
+import orjson
+
+from src import ingest_docs
+
+
+class FakeOpenAIClient:
+    """Cliente AsyncAzureOpenAI mínimo: registra las peticiones y responde al instante."""
+
+    def __init__(self, batch_model="text-embedding-3-large", interactive_model=None, dims=3):
+        self.batch_model = batch_model
+        self.interactive_model = interactive_model or batch_model
+        self.dims = dims
+        self.requests = []
+        self.batch_endpoint = None
+        self.closed = False
+        self.files = SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve)
+        self.embeddings = SimpleNamespace(create=self._embed)
+
+    async def _create_file(self, file, purpose):
+        self.requests = [orjson.loads(line) for line in file[1].splitlines()]
+        return SimpleNamespace(id="file-in")
+
+    async def _create_batch(self, input_file_id, endpoint, completion_window):
+        self.batch_endpoint = endpoint
+        return SimpleNamespace(id="batch-1", status="in_progress", output_file_id=None)
+
+    async def _retrieve(self, batch_id):
+        return SimpleNamespace(id=batch_id, status="completed", output_file_id="file-out")
+
+    async def _file_content(self, file_id):
+        # Orden inverso a propósito: el resultado debe reordenarse por custom_id
+        lines = [
+            orjson.dumps(
+                {
+                    "custom_id": request["custom_id"],
+                    "response": {
+                        "body": {
+                            "model": self.batch_model,
+                            "data": [{"embedding": [float(request["custom_id"])] * self.dims}],
+                        }
+                    },
+                }
+            )
+            for request in reversed(self.requests)
+        ]
+        return SimpleNamespace(content=b"\n".join(lines))
+
+    async def _embed(self, input, model):
+        return SimpleNamespace(
+            model=self.interactive_model, data=[SimpleNamespace(embedding=[0.0] * self.dims)]
+        )
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeEmbeddingCache:
+    def __init__(self):
+        self.stored = {}
+
+    def get_many(self, hashes, model):
+        return {h: self.stored[(h, model)] for h in hashes if (h, model) in self.stored}
+
+    def set_many(self, vectors, model):
+        for h, vector in vectors.items():
+            self.stored[(h, model)] = vector
+
+
+def _enable_batch_api(monkeypatch, client):
+    monkeypatch.setattr(ingest_docs, "BATCH_API_MIN_DOCS", 2)
+    monkeypatch.setattr(ingest_docs, "BATCH_API_POLL_SECONDS", 0)
+    monkeypatch.setattr(ingest_docs, "AsyncAzureOpenAI", lambda **kwargs: client)
+    monkeypatch.setattr(
+        ingest_docs.settings, "AZURE_OPENAI_EMBEDDING_BATCH_DEPLOYMENT", "embedding-batch"
+    )
+
+
+def test_batch_requests_target_the_embeddings_endpoint(monkeypatch):
+    monkeypatch.setattr(ingest_docs, "BATCH_API_POLL_SECONDS", 0)
+    client = FakeOpenAIClient()
+
+    vectors, model = asyncio.run(
+        ingest_docs._embed_with_batch_api(client, ["a", "b", "c"], "embedding-batch")
+    )
+
+    assert client.batch_endpoint == "/embeddings"
+    assert [r["url"] for r in client.requests] == ["/embeddings"] * 3
+    assert [r["body"] for r in client.requests] == [
+        {"model": "embedding-batch", "input": text} for text in ("a", "b", "c")
+    ]
+    assert vectors == [[0.0] * 3, [1.0] * 3, [2.0] * 3]
+    assert model == "text-embedding-3-large"
+
+
+def test_prefill_caches_vectors_under_the_interactive_deployment(monkeypatch):
+    client = FakeOpenAIClient()
+    cache = FakeEmbeddingCache()
+    _enable_batch_api(monkeypatch, client)
+
+    asyncio.run(ingest_docs._prefill_cache_with_batch_api(["uno", "dos"], cache))
+
+    assert client.closed
+    assert {model for _, model in cache.stored} == {"embedding-test"}
+    assert len(cache.stored) == 2
+
+
+def test_prefill_refuses_vectors_from_a_different_model(monkeypatch):
+    client = FakeOpenAIClient(
+        batch_model="text-embedding-3-small", interactive_model="text-embedding-3-large"
+    )
+    cache = FakeEmbeddingCache()
+    _enable_batch_api(monkeypatch, client)
+
+    asyncio.run(ingest_docs._prefill_cache_with_batch_api(["uno", "dos"], cache))
+
+    assert cache.stored == {}
+
+
+def test_prefill_refuses_vectors_with_different_dimensions(monkeypatch):
+    client = FakeOpenAIClient(dims=4)
+    cache = FakeEmbeddingCache()
+    _enable_batch_api(monkeypatch, client)
+
+    async def _interactive_info(client, sample):
+        return "text-embedding-3-large", 3
+
+    monkeypatch.setattr(ingest_docs, "_interactive_model_info", _interactive_info)
+
+    asyncio.run(ingest_docs._prefill_cache_with_batch_api(["uno", "dos"], cache))
+
+    assert cache.stored == {}
@@ -0,0 +1,69 @@
+import asyncio
+import importlib
+from collections import OrderedDict
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.application.nodes.classifier.classifier_node import _cache_key, classify_intents
+from src.domain.entities.schemas import IntentionEnum, IntentionResponse
+from src.routes import routes
+from src.routes.deps import get_current_user
+
+# El paquete reexporta la función classifier_node con el mismo nombre que su módulo
+classifier_module = importlib.import_module("src.application.nodes.classifier.classifier_node")
+
+
+def test_cache_key_ignores_case_accents_spacing_and_punctuation():
+    assert _cache_key("¿Qué es una  VNet?") == "que es una vnet"
+    assert _cache_key("que es una vnet") == "que es una vnet"
+    assert _cache_key("¿Cuál es el límite?") == _cache_key("cual es el limite")
+
+
+def test_cache_key_keeps_different_questions_apart():
+    assert _cache_key("¿Qué es una VNet?") != _cache_key("¿Qué es un NSG?")
+
+
+def _fake_classifier(monkeypatch):
+    calls = []
+
+    async def classify(text):
+        calls.append(text)
+        await asyncio.sleep(0.01 if "poema" in text else 0.03)
+        intention = (
+            IntentionEnum.FUERA_DE_DOMINIO if "poema" in text else IntentionEnum.PREGUNTA_TECNICA
+        )
+        return IntentionResponse(intention=intention, reasoning=text)
+
+    monkeypatch.setattr(classifier_module, "_classify_with_llm", classify)
+    monkeypatch.setattr(classifier_module, "_intent_cache", OrderedDict())
+    return calls
+
+
+def test_classify_intents_keeps_input_order_and_coalesces_duplicates(monkeypatch):
+    calls = _fake_classifier(monkeypatch)
+    texts = ["Explícame el peering de redes", "escribe un poema", "explicame el peering de redes"]
+
+    results = asyncio.run(classify_intents(texts))
+
+    assert [r.intention for r in results] == [
+        IntentionEnum.PREGUNTA_TECNICA,
+        IntentionEnum.FUERA_DE_DOMINIO,
+        IntentionEnum.PREGUNTA_TECNICA,
+    ]
+    assert calls == ["Explícame el peering de redes", "escribe un poema"]
+
+
+def test_classify_endpoint_returns_one_intention_per_text(monkeypatch):
+    _fake_classifier(monkeypatch)
+    app = FastAPI()
+    app.include_router(routes.router)
+    app.dependency_overrides[get_current_user] = lambda: {"google_sub": "test"}
+    client = TestClient(app)
+
+    response = client.post("/chat/classify", json={"texts": ["hola", "escribe un poema"]})
+    rejected = client.post("/chat/classify", json={"texts": []})
+
+    assert response.status_code == 200
+    assert [r["intention"] for r in response.json()["results"]] == ["SALUDO", "FUERA_DE_DOMINIO"]
+    assert rejected.status_code == 422
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from src.infrastructure.micro_batcher import MicroBatcher
+
+
+def test_concurrent_items_are_grouped_and_results_fanned_out_in_order():
+    calls = []
+
+    async def double(items):
+        calls.append(list(items))
+        await asyncio.sleep(0.01)
+        return [item * 2 for item in items]
+
+    async def scenario():
+        batcher = MicroBatcher(double, max_batch_size=4, max_wait_seconds=0.01)
+        try:
+            return await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+        finally:
+            await batcher.aclose()
+
+    assert asyncio.run(scenario()) == [i * 2 for i in range(10)]
+    assert [len(call) for call in calls] == [4, 4, 2]
+
+
+def test_batch_errors_reach_every_caller():
+    async def failing(items):
+        raise ValueError("embeddings caídos")
+
+    async def scenario():
+        batcher = MicroBatcher(failing, max_batch_size=8, max_wait_seconds=0.01)
+        try:
+            return await asyncio.gather(
+                *(batcher.submit(i) for i in range(3)), return_exceptions=True
+            )
+        finally:
+            await batcher.aclose()
+
+    results = asyncio.run(scenario())
+
+    assert len(results) == 3
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_short_result_list_fails_every_caller_instead_of_hanging():
+    async def truncated(items):
+        return [item for item in items][:1]
+
+    async def scenario():
+        batcher = MicroBatcher(truncated, max_batch_size=8, max_wait_seconds=0.01)
+        try:
+            return await asyncio.wait_for(
+                asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True),
+                timeout=1,
+            )
+        finally:
+            await batcher.aclose()
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_aclose_cancels_callers_of_an_unfinished_batch():
+    async def never_returns(items):
+        await asyncio.sleep(3600)
+
+    async def scenario():
+        batcher = MicroBatcher(never_returns, max_batch_size=8, max_wait_seconds=0.001)
+        pending = asyncio.ensure_future(batcher.submit("x"))
+        await asyncio.sleep(0.05)
+        await batcher.aclose()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(pending, timeout=1)
+
+    asyncio.run(scenario())
+
+
+def test_batcher_can_be_reused_across_event_loops():
+    async def identity(items):
+        return list(items)
+
+    batcher = MicroBatcher(identity, max_wait_seconds=0.001)
+
+    assert asyncio.run(batcher.submit("a")) == "a"
+    assert asyncio.run(batcher.submit("b")) == "b"
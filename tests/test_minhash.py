@@ -0,0 +1,32 @@
+from src.infrastructure.minhash import NearDuplicateFilter
+
+TEXT = (
+    "Una red virtual de Azure permite que los recursos se comuniquen de forma segura "
+    "entre sí, con Internet y con las redes locales mediante subredes, grupos de "
+    "seguridad de red y tablas de rutas definidas por el usuario."
+)
+
+
+def test_first_occurrence_is_kept_and_exact_copy_is_dropped():
+    dedup = NearDuplicateFilter()
+
+    assert dedup.is_duplicate(TEXT) is False
+    assert dedup.is_duplicate(TEXT) is True
+
+
+def test_near_duplicate_is_dropped():
+    dedup = NearDuplicateFilter(threshold=0.7)
+    dedup.is_duplicate(TEXT)
+
+    assert dedup.is_duplicate(TEXT.replace("usuario.", "usuario final.")) is True
+
+
+def test_different_documents_are_kept():
+    dedup = NearDuplicateFilter()
+    dedup.is_duplicate(TEXT)
+
+    other = (
+        "Azure Key Vault guarda secretos, claves y certificados, y controla el acceso "
+        "a ellos con identidades administradas y directivas de acceso."
+    )
+    assert dedup.is_duplicate(other) is False
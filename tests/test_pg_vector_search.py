@@ -0,0 +1,49 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+
+from src.adapters.local import pg_vector_search
+from src.adapters.local.pg_vector_search import PostgresSearchService
+
+
+class FakePool:
+    """Pool psycopg mínimo: registra en qué hilo se pide cada conexión."""
+
+    def __init__(self):
+        self.threads = []
+        self.statements = []
+
+    @contextmanager
+    def connection(self):
+        self.threads.append(threading.get_ident())
+        yield self
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    def execute(self, sql, params=None, **kwargs):
+        self.statements.append(sql)
+
+    def executemany(self, sql, rows):
+        self.statements.append(sql)
+
+
+def test_ingest_calls_run_off_the_event_loop_thread(monkeypatch):
+    pool = FakePool()
+    monkeypatch.setattr(pg_vector_search, "get_pool", lambda db_url: pool)
+    docs = [{"id": "1", "title": "Redes", "content": "VNet", "content_vector": [0.1, 0.2]}]
+
+    async def scenario():
+        service = PostgresSearchService(db_url="postgresql://test")
+        try:
+            await service.create_or_update_index("docs-test", 2)
+            return await service.upsert_vectors("docs-test", docs)
+        finally:
+            await service.aclose()
+
+    counters = asyncio.run(scenario())
+
+    assert counters == {"total_success": 1, "total_failed": 0}
+    assert len(pool.threads) == 2
+    assert threading.get_ident() not in pool.threads
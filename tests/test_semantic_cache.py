@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.infrastructure import semantic_cache
+from src.infrastructure.semantic_cache import SemanticCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(semantic_cache, "time", SimpleNamespace(monotonic=lambda: fake.now))
+    return fake
+
+
+def test_similar_vectors_hit_and_dissimilar_ones_miss(clock):
+    cache = SemanticCache(threshold=0.9)
+    cache.store([1.0, 0.0, 0.0], "vnet")
+
+    assert cache.lookup([0.99, 0.05, 0.0]) == "vnet"
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = SemanticCache(ttl_seconds=10)
+    cache.store([1.0, 0.0], "vnet")
+
+    clock.now += 9
+    assert cache.lookup([1.0, 0.0]) == "vnet"
+    clock.now += 2
+    assert cache.lookup([1.0, 0.0]) is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = SemanticCache(max_size=2)
+    cache.store([1.0, 0.0, 0.0], "vnet")
+    clock.now += 1
+    cache.store([0.0, 1.0, 0.0], "nsg")
+    clock.now += 1
+    assert cache.lookup([1.0, 0.0, 0.0]) == "vnet"
+
+    clock.now += 1
+    cache.store([0.0, 0.0, 1.0], "aks")
+
+    assert len(cache) == 2
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+    assert cache.lookup([1.0, 0.0, 0.0]) == "vnet"
+    assert cache.lookup([0.0, 0.0, 1.0]) == "aks"
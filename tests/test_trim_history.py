@@ -0,0 +1,36 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from src.application import graph
+
+
+def _turn(question: str, answer: str, tool_content: str = "{}") -> list:
+    tool_call_id = f"call_{question}"
+    return [
+        HumanMessage(content=question),
+        AIMessage(
+            content="",
+            tool_calls=[
+                {"name": "search_technical_docs", "args": {"query": question}, "id": tool_call_id}
+            ],
+        ),
+        ToolMessage(content=tool_content, tool_call_id=tool_call_id),
+        AIMessage(content=answer),
+    ]
+
+
+def test_history_within_budget_is_kept(monkeypatch):
+    monkeypatch.setattr(graph.settings, "AGENT_HISTORY_MAX_TOKENS", 10_000)
+    history = _turn("vnet", "respuesta") + _turn("nsg", "respuesta")
+
+    assert graph._trim_history(history) == history
+
+
+def test_oversized_last_turn_falls_back_to_that_turn_only(monkeypatch, caplog):
+    monkeypatch.setattr(graph.settings, "AGENT_HISTORY_MAX_TOKENS", 50)
+    previous = _turn("vnet", "respuesta")
+    current = _turn("nsg", "respuesta", tool_content="x" * 5_000)
+
+    trimmed = graph._trim_history(previous + current)
+
+    assert trimmed == current
+    assert any(r.levelname == "WARNING" for r in caplog.records)
@@ -0,0 +1,67 @@
+import asyncio
+from types import SimpleNamespace
+
+from azure.search.documents.aio import SearchIndexingBufferedSender
+
+from src.adapters.azure import ai_search
+from src.adapters.azure.ai_search import AzureAISearchService
+
+
+class StubSender(SearchIndexingBufferedSender):
+    """Sender real del SDK con la llamada HTTP al índice sustituida."""
+
+    failing_keys = set()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._index_key = "id"
+
+    async def _index_documents_actions(self, actions, **kwargs):
+        return [
+            SimpleNamespace(
+                key=action.additional_properties["id"],
+                succeeded=action.additional_properties["id"] not in self.failing_keys,
+                status_code=400 if action.additional_properties["id"] in self.failing_keys else 200,
+            )
+            for action in actions
+        ]
+
+
+def _upsert(monkeypatch, docs, failing_keys=()):
+    monkeypatch.setattr(StubSender, "failing_keys", set(failing_keys))
+    monkeypatch.setattr(ai_search, "SearchIndexingBufferedSender", StubSender)
+
+    async def scenario():
+        service = AzureAISearchService()
+        try:
+            return await service.upsert_vectors("docs-test", docs)
+        finally:
+            await service.aclose()
+
+    return asyncio.run(scenario())
+
+
+def _docs(count):
+    return [{"id": str(i), "content": f"doc {i}", "content_vector": [0.1, 0.2]} for i in range(count)]
+
+
+def test_upsert_counts_each_acknowledged_document_once(monkeypatch):
+    counters = _upsert(monkeypatch, _docs(5), failing_keys={"3"})
+
+    assert counters == {"total_success": 4, "total_failed": 1}
+
+
+def test_upsert_without_documents_skips_the_sender(monkeypatch):
+    assert _upsert(monkeypatch, []) == {"total_success": 0, "total_failed": 0}
+
+
+def test_upsert_logs_timing_for_every_full_batch(monkeypatch, caplog):
+    monkeypatch.setattr(ai_search, "MAX_BATCH_ACTION_COUNT", 2)
+
+    with caplog.at_level("INFO", logger=ai_search.logger.name):
+        counters = _upsert(monkeypatch, _docs(5))
+
+    batch_logs = [r.getMessage() for r in caplog.records if "confirmado en" in r.getMessage()]
+    assert counters == {"total_success": 5, "total_failed": 0}
+    assert len(batch_logs) == 2
+    assert all(message.startswith("upsert_vectors - Lote de 2 docs") for message in batch_logs)
@@ -0,0 +1,69 @@
+import asyncio
+
+from src.adapters.azure.ai_search import AzureAISearchService
+from src.infrastructure.micro_batcher import MicroBatcher
+from src.infrastructure.vector_memo import QueryVectorMemo
+
+
+def test_memo_reuses_vectors_and_evicts_least_recently_used():
+    calls = []
+
+    async def compute(text):
+        calls.append(text)
+        return [float(len(text))]
+
+    async def scenario():
+        memo = QueryVectorMemo(max_size=2)
+        await memo.get_or_compute("vnet", compute)
+        await memo.get_or_compute("  vnet  ", compute)
+        await memo.get_or_compute("nsg", compute)
+        await memo.get_or_compute("vnet", compute)
+        await memo.get_or_compute("aks", compute)
+        await memo.get_or_compute("nsg", compute)
+        return memo
+
+    memo = asyncio.run(scenario())
+
+    assert calls == ["vnet", "nsg", "aks", "nsg"]
+    assert len(memo) == 2
+
+
+def test_concurrent_requests_for_the_same_text_share_one_call():
+    calls = []
+
+    async def compute(text):
+        calls.append(text)
+        await asyncio.sleep(0.01)
+        return [1.0]
+
+    async def scenario():
+        memo = QueryVectorMemo()
+        return await asyncio.gather(*(memo.get_or_compute("vnet", compute) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == [[1.0]] * 5
+    assert calls == ["vnet"]
+
+
+def test_search_adapter_embeds_a_question_once_per_turn():
+    batches = []
+
+    async def embed_batch(queries):
+        batches.append(queries)
+        return [[0.1, 0.2] for _ in queries]
+
+    async def scenario():
+        service = AzureAISearchService()
+        service.embed_batcher = MicroBatcher(embed_batch)
+        try:
+            # Caché de respuestas (agent), búsqueda y store (finalize) del mismo turno
+            first = await service.embed_query("¿Qué es una VNet?")
+            second = await service.embed_query("¿Qué es una VNet? ")
+            third = await service.embed_query("¿Qué es una VNet?")
+        finally:
+            await service.aclose()
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+
+    assert first == second == third == [0.1, 0.2]
+    assert batches == [["¿Qué es una VNet?"]]